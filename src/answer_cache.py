@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import metrics
+from hybrid_retrieval import exact_terms
+
+THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+CachedAnswer = namedtuple("CachedAnswer", "answer sources question similarity")
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?!. ")
+
+
+class _Entry:
+    __slots__ = ("version", "question", "terms", "vector", "answer", "sources", "created")
+
+    def __init__(self, version, question, vector, answer, sources):
+        self.version = version
+        self.question = question
+        self.terms = exact_terms(question)
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created = time.time()
+
+
+class AnswerCache:
+    """Answers keyed by index and question embedding.
+
+    A question matches a cached one asked of the same index version when the
+    cosine similarity of their embeddings is at least threshold and both name
+    the same part numbers, sizes and codes (embeddings barely tell "M8" from
+    "M10"). Entries from an older index version are dropped as soon as they
+    are seen, entries older than ttl seconds expire, and the least recently
+    used go once there are more than max_entries.
+    """
+
+    def __init__(self, embedding, threshold=THRESHOLD, ttl=TTL, max_entries=MAX_ENTRIES):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, question):
+        vector = np.asarray(self.embedding.embed_query(question), dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live_entries(self, index_key, version):
+        now = time.time()
+        live = []
+        for key, entry in list(self._entries.items()):
+            if key[0] != index_key:
+                continue
+            if entry.version != version or now - entry.created > self.ttl:
+                del self._entries[key]
+            else:
+                live.append((key, entry))
+        return live
+
+    def lookup(self, index_key, version, question):
+        with metrics.span("answer_cache.lookup") as current:
+            hit = self._lookup(index_key, version, question)
+            current.set(hit=hit is not None)
+        if hit is None:
+            self.misses += 1
+            metrics.count("answer_cache.misses")
+        else:
+            self.hits += 1
+            metrics.count("answer_cache.hits")
+        return hit
+
+    def _lookup(self, index_key, version, question):
+        normalized = normalize_question(question)
+        with self._lock:
+            live = self._live_entries(index_key, version)
+            if not live:
+                return None
+            # Exact repeats don't need the question embedded at all
+            exact = (index_key, normalized)
+            if exact in self._entries:
+                self._entries.move_to_end(exact)
+                entry = self._entries[exact]
+                return CachedAnswer(entry.answer, entry.sources, entry.question, 1.0)
+
+        terms = exact_terms(question)
+        live = [(key, entry) for key, entry in live if entry.terms == terms]
+        if not live:
+            return None
+        vector = self._embed(question)
+        with self._lock:
+            live = [(key, entry) for key, entry in live if key in self._entries]
+            if not live:
+                return None
+            scores = np.stack([entry.vector for _, entry in live]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            key, entry = live[best]
+            self._entries.move_to_end(key)
+            return CachedAnswer(entry.answer, entry.sources, entry.question, min(float(scores[best]), 1.0))
+
+    def store(self, index_key, version, question, answer, sources=()):
+        key = (index_key, normalize_question(question))
+        entry = _Entry(version, question, self._embed(question), answer, list(sources))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, index_key=None):
+        with self._lock:
+            if index_key is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == index_key]:
+                del self._entries[key]
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,87 @@
+"""Replay synthetic day7 chat sessions concurrently against the fake chat model.
+
+    cd src && python -m bench.chat_load --sessions 200 --turns 5 --max-inflight 8 16 32
+
+Every session sends its turns back to back (plus --think-time) through one
+ChatServer, so the numbers show how latency and throughput trade off
+against the in-flight cap.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from bench.fakes import FakeChatModel
+from chat_server import ChatServer
+from session_store import SessionStore
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def replay(server, session_id, turns, think_time, stream, latencies):
+    for i in range(turns):
+        question = f"Question {i} from {session_id}: what does the manual say about topic {i}?"
+        start = time.perf_counter()
+        if stream:
+            async for _ in server.stream_turn(session_id, question):
+                pass
+        else:
+            await server.turn(session_id, question)
+        latencies.append(time.perf_counter() - start)
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+async def measure(args, max_inflight):
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.llm_token_latency, answer_tokens=args.answer_tokens)
+    server = ChatServer(llm, SessionStore(max_sessions=args.max_sessions), max_inflight)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        replay(server, f"session-{i}", args.turns, args.think_time, args.stream, latencies)
+        for i in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        "max_inflight": max_inflight,
+        "sessions": args.sessions,
+        "turns": len(latencies),
+        "seconds": round(elapsed, 4),
+        "turns_per_second": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "llm_calls": llm.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--max-inflight", type=int, nargs="+", default=[16])
+    parser.add_argument("--max-sessions", type=int, default=1000, help="SessionStore capacity")
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-token-latency", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--stream", action="store_true", help="drive turns through astream instead of ainvoke")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for max_inflight in args.max_inflight:
+        result = asyncio.run(measure(args, max_inflight))
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic PDF corpora for the benchmarks.
+
+The PDFs are written by hand (one Helvetica text object per line) so no PDF
+writing library is needed; PyPDF2 reads them back like any other file.
+"""
+import os
+import random
+
+VOCABULARY = (
+    "system pipeline index vector chunk document retrieval embedding latency throughput "
+    "request batch cache memory answer question context model server client storage "
+    "error code part number manual section install configure update release version "
+    "warranty support network power supply sensor module firmware interface protocol"
+).split()
+
+SIZES = {
+    "small": {"documents": 2, "pages": 5},
+    "medium": {"documents": 5, "pages": 40},
+    "large": {"documents": 10, "pages": 200},
+}
+
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(rng, doc_no, page_no):
+    lines = []
+    for line_no in range(LINES_PER_PAGE):
+        words = [rng.choice(VOCABULARY) for _ in range(WORDS_PER_LINE)]
+        if line_no == 0:
+            # Unique, exactly-matchable tokens such as part numbers and error codes
+            words[:2] = [f"PN-{doc_no:03d}-{page_no:04d}", f"E{rng.randrange(1000, 9999)}"]
+        lines.append(" ".join(words))
+    return lines
+
+
+def make_pdf(pages):
+    font_id = 3 + 2 * len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        body = "BT /F1 9 Tf 11 TL 36 756 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_corpus(directory, documents, pages, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for doc_no in range(documents):
+        path = os.path.join(directory, f"doc_{doc_no:03d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf([page_lines(rng, doc_no, page_no) for page_no in range(pages)]))
+        paths.append(path)
+    return paths
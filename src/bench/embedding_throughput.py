@@ -0,0 +1,70 @@
+"""Measure embedding throughput against concurrency using the fake server.
+
+    python -m bench.embedding_throughput --texts 2000 --concurrency 1 2 4 8 16
+"""
+import argparse
+import json
+import time
+
+from bench.fake_embedding_server import HttpEmbeddings, start_server
+from embed_executor import EmbeddingExecutor
+
+
+def measure(url, texts, batch_size, concurrency, requests_per_second):
+    executor = EmbeddingExecutor(
+        HttpEmbeddings(url),
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+        requests_per_second=requests_per_second,
+        base_delay=0.05,
+        max_delay=1.0,
+    )
+    start = time.perf_counter()
+    vectors = executor.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(texts)
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "texts": len(texts),
+        "seconds": round(elapsed, 4),
+        "texts_per_second": round(len(texts) / elapsed, 2),
+        **executor.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-second", type=float, default=0, help="0 disables the rate limiter")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--server-max-concurrent", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    server = start_server(
+        latency=args.latency,
+        max_concurrent=args.server_max_concurrent,
+        error_rate=args.error_rate,
+    )
+    texts = [f"synthetic chunk {i} " * 20 for i in range(args.texts)]
+
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            result = measure(server.url, texts, args.batch_size, concurrency, args.requests_per_second)
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
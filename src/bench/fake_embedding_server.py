@@ -0,0 +1,140 @@
+"""Local stand-in for the embedding API, for offline load testing.
+
+Run it standalone with ``python -m bench.fake_embedding_server --port 8765`` or
+start it in-process with start_server(). It returns deterministic vectors and
+can simulate latency, a server-side concurrency limit (429s) and random 503s.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.embeddings import Embeddings
+
+DIM = 768
+
+
+def fake_vector(text, dim=DIM):
+    values = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(b / 127.5 - 1.0 for b in digest)
+        counter += 1
+    return values[:dim]
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.05, per_text_latency=0.001, max_concurrent=8, error_rate=0.0, dim=DIM):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.max_concurrent = max_concurrent
+        self.error_rate = error_rate
+        self.dim = dim
+
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        texts = json.loads(self.rfile.read(length) or b"{}").get("texts", [])
+
+        with server._lock:
+            server.requests += 1
+            if server.in_flight >= server.max_concurrent:
+                server.rejected += 1
+                return self._reply(429, {"error": "quota exceeded"})
+            server.in_flight += 1
+
+        try:
+            time.sleep(server.latency + server.per_text_latency * len(texts))
+            if server.error_rate and random.random() < server.error_rate:
+                return self._reply(503, {"error": "unavailable"})
+            self._reply(200, {"embeddings": [fake_vector(t, server.dim) for t in texts]})
+        finally:
+            with server._lock:
+                server.in_flight -= 1
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    server = FakeEmbeddingServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class HttpEmbeddings(Embeddings):
+    def __init__(self, url, model="fake-embedding", timeout=30):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+
+    def embed_documents(self, texts):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"texts": list(texts)}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        # HTTPError carries .code, so 429/503 are retried by EmbeddingExecutor
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["embeddings"]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--per-text-latency", type=float, default=0.001)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(
+        (args.host, args.port),
+        latency=args.latency,
+        per_text_latency=args.per_text_latency,
+        max_concurrent=args.max_concurrent,
+        error_rate=args.error_rate,
+    )
+    print(f"Fake embedding server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Deterministic, offline stand-ins for the Gemini embedding and chat models."""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from bench.fake_embedding_server import fake_vector
+
+WORDS = (
+    "the index stores chunks of every document and the retriever returns the closest ones "
+    "so the model can answer from context instead of memory while latency stays low"
+).split()
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dim=256, latency=0.0, per_text_latency=0.0, model="fake-embedding"):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.model = model
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        if self.latency or self.per_text_latency:
+            time.sleep(self.latency + self.per_text_latency * len(texts))
+        return [fake_vector(t, self.dim) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Answers with text derived from a hash of the prompt.
+
+    latency is paid before the first token and token_latency between tokens,
+    so both time-to-first-token and total time can be benchmarked.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_tokens: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return [WORDS[seed[i % len(seed)] % len(WORDS)] for i in range(self.answer_tokens)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        tokens = self._answer(messages)
+        time.sleep(self.latency + self.token_latency * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, token in enumerate(self._answer(messages)):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            text = token if i == 0 else " " + token
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        tokens = self._answer(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._answer(messages)):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            text = token if i == 0 else " " + token
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,232 @@
+"""Offline benchmark of every RAG pipeline stage, written as JSON.
+
+    cd src && python -m bench.run --sizes small medium --output bench_results.json
+
+Gemini is replaced by the deterministic fakes in bench.fakes, so results only
+move when the pipeline code does and can be diffed across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+import pdf_pipeline
+from bench.corpus import SIZES, make_corpus
+from answer_cache import AnswerCache
+from bench.fakes import FakeChatModel, FakeEmbeddings
+from chat_memory import estimate_tokens
+from context_compression import ContextCompressor
+from embed_executor import EmbeddingExecutor
+from embedding_cache import CachedEmbeddings
+from hybrid_retrieval import KeywordIndex, hybrid_retriever
+from ingest import ingest_documents, ingest_faiss, iter_chunks
+from resource_cache import ResourceCache
+
+PART_NUMBER_RE = re.compile(r"PN-\d{3}-\d{4}")
+
+QUESTIONS = [
+    "What does the manual say about firmware updates?",
+    "How do I configure the network interface?",
+    "Which error code relates to the power supply?",
+    "What is part number PN-000-0003 used for?",
+]
+
+# A chat mixing self-contained questions with follow-ups that need condensing
+CHAT = [
+    "What does the manual say about firmware updates?",
+    "How often should I do it?",
+    "Which error code relates to the power supply?",
+    "What about the sensor module?",
+    "How do I configure the network interface?",
+    "Why does that matter?",
+]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def row(corpus, stage, items, seconds, **extra):
+    return {
+        "corpus": corpus,
+        "stage": stage,
+        "items": items,
+        "seconds": round(seconds, 6),
+        "ms_per_item": round(seconds * 1000 / items, 6) if items else None,
+        **extra,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_corpus(name, workdir, args):
+    results = []
+    spec = SIZES[name]
+    paths = make_corpus(os.path.join(workdir, name), spec["documents"], spec["pages"])
+    pdf_pipeline.PAGE_CACHE_DIR = os.path.join(workdir, f"{name}_page_cache")
+
+    records, seconds = timed(lambda: list(pdf_pipeline.extract_pages(paths)))
+    results.append(row(name, "extract_cold", len(records), seconds))
+    _, seconds = timed(lambda: list(pdf_pipeline.extract_pages(paths)))
+    results.append(row(name, "extract_cached", len(records), seconds))
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    docs, seconds = timed(lambda: list(iter_chunks(iter(records), splitter)))
+    results.append(row(name, "split", len(docs), seconds))
+    texts = [doc.page_content for doc in docs]
+
+    fake = FakeEmbeddings(dim=args.dim, latency=args.embed_latency, per_text_latency=args.embed_per_text_latency)
+    executor = EmbeddingExecutor(fake, max_concurrency=args.embed_concurrency, requests_per_second=0)
+    _, seconds = timed(executor.embed_documents, texts)
+    results.append(row(name, "embed_executor", len(texts), seconds, requests=executor.requests))
+
+    cached = CachedEmbeddings(executor, model="fake", path=os.path.join(workdir, f"{name}_embeddings.sqlite3"))
+    _, seconds = timed(cached.embed_documents, texts)
+    results.append(row(name, "embed_cache_cold", len(texts), seconds, **cached.stats()))
+    _, seconds = timed(cached.embed_documents, texts)
+    results.append(row(name, "embed_cache_warm", len(texts), seconds, **cached.stats()))
+
+    from langchain_chroma import Chroma
+
+    persist_dir = os.path.join(workdir, f"{name}_chroma")
+    chroma = Chroma(persist_directory=persist_dir, embedding_function=cached)
+    keyword_index = KeywordIndex()
+    _, seconds = timed(ingest_documents, chroma, iter(docs), with_ids=True, keyword_index=keyword_index)
+    results.append(row(name, "index_build_chroma", len(docs), seconds))
+
+    faiss_store, seconds = timed(ingest_faiss, iter(texts), cached)
+    results.append(row(name, "index_build_faiss", len(texts), seconds, index=type(faiss_store.index).__name__))
+
+    queries = (QUESTIONS * (args.queries // len(QUESTIONS) + 1))[:args.queries]
+    for label, store in (("chroma", chroma), ("faiss", faiss_store)):
+        _, seconds = timed(lambda: [store.similarity_search(q, k=4) for q in queries])
+        results.append(row(name, f"retrieve_{label}", len(queries), seconds))
+
+    # Exact-term questions: does a chunk holding the part number make the top 4?
+    # Taken from the extracted pages, not the chunks, so a part number mangled by chunking counts as a miss
+    part_numbers = sorted({pn for _, _, text in records for pn in PART_NUMBER_RE.findall(text)})
+    part_numbers = part_numbers[::max(1, len(part_numbers) // args.queries)][:args.queries]
+    for label, retriever in (
+        ("dense", chroma.as_retriever(search_kwargs={"k": 4})),
+        ("hybrid", hybrid_retriever(chroma, keyword_index, k=4)),
+    ):
+        found, seconds = timed(lambda: [
+            any(pn in doc.page_content for doc in retriever.invoke(f"What is part number {pn} used for?"))
+            for pn in part_numbers
+        ])
+        results.append(row(name, f"retrieve_{label}_exact", len(part_numbers), seconds, recall_at_4=sum(found) / len(found)))
+
+    retrieved = [(q, chroma.similarity_search(q, k=4)) for q in queries]
+    compressor = ContextCompressor(embedding=cached, token_budget=args.context_budget)
+    embedded_before = fake.texts
+    compressed, seconds = timed(lambda: [compressor.compress_documents(found, q) for q, found in retrieved])
+    results.append(row(
+        name, "compress", len(queries), seconds, texts_embedded=fake.texts - embedded_before,
+        tokens_in=sum(estimate_tokens(doc.page_content) for _, found in retrieved for doc in found),
+        tokens_out=sum(estimate_tokens(doc.page_content) for found in compressed for doc in found),
+    ))
+
+    answers = AnswerCache(cached)
+    _, seconds = timed(lambda: [answers.lookup(persist_dir, 0, q) or answers.store(persist_dir, 0, q, q) for q in queries])
+    results.append(row(name, "answer_cache", len(queries), seconds, **answers.stats()))
+
+    results.extend(bench_chat_turns(name, persist_dir, cached, args))
+    return results
+
+
+def bench_chat_turns(name, persist_dir, embedding, args):
+    from langchain.chains import ConversationalRetrievalChain
+    from langchain_chroma import Chroma
+
+    from conversational_rag import FastConversationalRAG
+
+    results = []
+    variants = ["chain", "always", "skip"]
+    for variant in variants:
+        llm = FakeChatModel(latency=args.llm_latency, token_latency=args.llm_token_latency)
+        resources = ResourceCache()
+
+        def build():
+            vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embedding)
+            retriever = vectorstore.as_retriever()
+            if variant == "chain":
+                return vectorstore, ConversationalRetrievalChain.from_llm(llm, retriever)
+            return vectorstore, FastConversationalRAG(llm, retriever, mode=variant)
+
+        # Mirrors the day10 Send handler: cached resources, then one RAG call per turn
+        history = []
+        timings = []
+        for question in CHAT:
+            start = time.perf_counter()
+            _, rag = resources.get(persist_dir, 0, build)
+            if variant == "chain":
+                answer = rag.invoke({"question": question, "chat_history": history})["answer"]
+            else:
+                answer = rag.invoke(question, history)["answer"]
+            timings.append(time.perf_counter() - start)
+            history.append((question, answer))
+
+        results.append(row(name, f"chat_turn_{variant}", len(timings), sum(timings), llm_calls=llm.calls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium"])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.0)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--context-budget", type=int, default=500)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--llm-token-latency", type=float, default=0.0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary corpora and indexes")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    results = []
+    try:
+        for name in args.sizes:
+            for result in run_corpus(name, workdir, args):
+                print(json.dumps(result))
+                results.append(result)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
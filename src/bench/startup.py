@@ -0,0 +1,121 @@
+"""Cold-start time of the launcher, the CLI day modules and the Streamlit apps.
+
+    cd src && python -m bench.startup --top 10 --output startup.json
+
+Every target runs in a fresh interpreter under `python -X importtime`, in a
+scratch directory so the apps' stores don't touch the working tree. CLI
+modules are timed by importing them; Streamlit apps by one AppTest run of
+the script, which is what a user waits for on first page load. The report
+lists wall time and the imports that took longest (cumulative).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI_MODULES = ["main", "day1", "day3", "day5", "day6", "day7"]
+APPS = ["day2", "day4", "day8", "day9", "day10"]
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+print("RESULT", time.perf_counter() - start)
+"""
+
+APP_SCRIPT = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout=300)
+app.run()
+print("RESULT", time.perf_counter() - start)
+for error in app.exception:
+    print("APP_ERROR", error.message)
+"""
+
+
+def parse_importtime(stderr):
+    """(cumulative µs, self µs, module, depth) for every line `python -X importtime` printed."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # One space follows the separator, then two more per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((int(cumulative_us), int(self_us), name.strip(), depth))
+    return entries
+
+
+def measure(target, script, timeout):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC_DIR, env.get("PYTHONPATH")]))
+    env.setdefault("GOOGLE_API_KEY", "startup-bench")
+    env.setdefault("GEMINI_API_KEY", "startup-bench")
+    env.setdefault("ANONYMIZED_TELEMETRY", "False")
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", script],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+    seconds = None
+    errors = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            seconds = float(line.split()[1])
+        elif line.startswith("APP_ERROR "):
+            errors.append(line[len("APP_ERROR "):])
+    if proc.returncode:
+        errors.append(proc.stderr.strip().splitlines()[-1])
+    imports = parse_importtime(proc.stderr)
+    return {
+        "target": target,
+        "seconds": None if seconds is None else round(seconds, 3),
+        "import_seconds": round(sum(c for c, _, _, depth in imports if depth == 0) / 1e6, 3),
+        "modules": len(imports),
+        "slowest": imports,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", nargs="+", default=CLI_MODULES + APPS)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per target")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for target in args.targets:
+        if target in APPS:
+            script = APP_SCRIPT.format(path=os.path.join(SRC_DIR, f"{target}.py"))
+        else:
+            script = IMPORT_SCRIPT.format(module=target)
+        result = measure(target, script, args.timeout)
+        # Only top-level imports: nested ones are already inside their parent's cumulative time
+        top_level = [entry for entry in result["slowest"] if entry[3] == 0]
+        result["slowest"] = [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for cumulative, self_us, name, _ in sorted(top_level, reverse=True)[:args.top]
+        ]
+        results.append(result)
+
+        seconds = "failed" if result["seconds"] is None else f"{result['seconds']:.2f}s"
+        print(f"{target:<8} {seconds:>8}  ({result['modules']} modules imported)")
+        for entry in result["slowest"]:
+            print(f"    {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+        for error in result["errors"]:
+            print(f"    error: {error}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+import metrics
+
+KEEP_TURNS = int(os.getenv("MEMORY_KEEP_TURNS", "4"))
+TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "2000"))
+SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "300"))
+# Fold this many extra turns at once so the summary LLM call isn't paid every turn
+FOLD_BATCH = 2
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """Progressively summarize the conversation, adding the new lines to the current summary.
+Keep names, numbers and decisions. Answer with the new summary only, in at most {words} words.
+
+Current summary:
+{summary}
+
+New lines:
+{lines}
+
+New summary:"""
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def new_memory_state():
+    return {"summary": "", "turns": []}
+
+
+class ConversationMemory:
+    """Token-budgeted chat memory: a rolling summary plus the last turns verbatim.
+
+    Wraps a plain dict (see new_memory_state) so it can live in session state
+    or be stored as JSON.
+    """
+
+    def __init__(self, state=None, keep_turns=KEEP_TURNS, token_budget=TOKEN_BUDGET, summary_tokens=SUMMARY_TOKENS):
+        self.state = state if state is not None else new_memory_state()
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+
+    @property
+    def summary(self):
+        return self.state["summary"]
+
+    @property
+    def turns(self):
+        return self.state["turns"]
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(u) + estimate_tokens(a) for u, a in self.turns)
+
+    def messages(self, system_prompt=None):
+        messages = []
+        system = system_prompt or ""
+        if self.summary:
+            system = f"{system}\n\nSummary of the earlier conversation:\n{self.summary}".strip()
+        if system:
+            messages.append(SystemMessage(content=system))
+        for user, ai in self.turns:
+            messages.append(HumanMessage(content=user))
+            messages.append(AIMessage(content=ai))
+        return messages
+
+    def add_turn(self, user, ai, llm=None):
+        self.turns.append([user, ai])
+        if len(self.turns) > self.keep_turns + FOLD_BATCH or self.tokens() > self.token_budget:
+            self._fold(llm)
+
+    def _fold(self, llm):
+        folded = []
+        while len(self.turns) > self.keep_turns or (len(self.turns) > 1 and self.tokens() > self.token_budget):
+            folded.append(self.turns.pop(0))
+
+        if folded:
+            with metrics.span("memory.fold", turns=len(folded)):
+                self.state["summary"] = self._summarize(folded, llm)
+
+        # A single huge turn can still blow the budget; trim it rather than send it whole
+        # estimate_tokens() rounds each text up by a token, hence the 2 kept back for the turn's halves
+        limit = max(0, self.token_budget - estimate_tokens(self.summary) - 2) * CHARS_PER_TOKEN
+        if self.turns and self.tokens() > self.token_budget:
+            user, ai = self.turns[-1]
+            self.turns[-1] = [user[:limit // 2], ai[:limit // 2]]
+
+    def _summarize(self, turns, llm):
+        lines = "\n".join(f"Human: {u}\nAI: {a}" for u, a in turns)
+        max_chars = self.summary_tokens * CHARS_PER_TOKEN
+        if llm is not None:
+            prompt = SUMMARY_PROMPT.format(
+                words=self.summary_tokens * 3 // 4,
+                summary=self.summary or "(empty)",
+                lines=lines,
+            )
+            try:
+                return llm.invoke(prompt).content.strip()[:max_chars]
+            except Exception:
+                pass
+        # Without an LLM keep the most recent text that fits
+        return f"{self.summary}\n{lines}".strip()[-max_chars:]
@@ -0,0 +1,119 @@
+"""The day7 chat graph, and asyncio serving of many sessions through it.
+
+build_chat_graph() wires a chat model and a SessionStore into day7's
+one-node LangGraph; it runs both through invoke() and ainvoke()/astream().
+ChatServer drives many sessions on one event loop: a session's turns run
+one at a time in arrival order, and at most max_inflight model calls are
+outstanding across all sessions.
+"""
+import asyncio
+import contextvars
+import os
+from contextlib import asynccontextmanager, nullcontext
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+MAX_INFLIGHT = int(os.getenv("CHAT_MAX_INFLIGHT", "16"))
+
+
+class ChatState(TypedDict):
+    input: str
+    messages: Annotated[list, add_messages]
+
+
+def add_turn_detached(memory, user, answer, llm):
+    """memory.add_turn() without the calling node's callbacks.
+
+    Folding old turns makes a summary call of its own. Inside a node it would
+    report to the graph's callbacks, and stream_mode="messages" would stream
+    the summary as part of the answer. Runs in a copy of the current context,
+    so the node's own config is left as it was.
+    """
+
+    def fold():
+        var_child_runnable_config.set(None)
+        memory.add_turn(user, answer, llm)
+
+    contextvars.copy_context().run(fold)
+
+
+def build_chat_graph(llm, sessions, llm_slots=None):
+    """llm_slots, an asyncio.Semaphore, bounds concurrent model calls on the async path."""
+
+    def respond(state: ChatState, config: RunnableConfig) -> dict:
+        session_id = config["configurable"]["session_id"]
+        memory = sessions.get(session_id)
+        user_message = HumanMessage(content=state["input"])
+
+        # The model sees the session's window and summary, not its whole history
+        response = llm.invoke(memory.messages() + [user_message], config)
+
+        add_turn_detached(memory, state["input"], response.content, llm)
+        sessions.put(session_id, memory)
+
+        # Only this turn's messages; the history lives in the session store
+        return {"messages": [user_message, response]}
+
+    async def arespond(state: ChatState, config: RunnableConfig) -> dict:
+        session_id = config["configurable"]["session_id"]
+        memory = sessions.get(session_id)
+        user_message = HumanMessage(content=state["input"])
+
+        async with llm_slots or nullcontext():
+            response = await llm.ainvoke(memory.messages() + [user_message], config)
+            # Folding old turns into the summary is a blocking model call of its own
+            await asyncio.to_thread(add_turn_detached, memory, state["input"], response.content, llm)
+        sessions.put(session_id, memory)
+
+        return {"messages": [user_message, response]}
+
+    graph = StateGraph(ChatState)
+    graph.add_node("respond", RunnableLambda(respond, afunc=arespond))
+    graph.set_entry_point("respond")
+    graph.add_edge("respond", END)
+    return graph.compile()
+
+
+class ChatServer:
+    def __init__(self, llm, sessions, max_inflight=MAX_INFLIGHT):
+        self.graph = build_chat_graph(llm, sessions, asyncio.Semaphore(max_inflight))
+        self._locks = {}
+
+    @asynccontextmanager
+    async def _session(self, session_id):
+        # asyncio.Lock wakes waiters first come, first served, so turns keep their order
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[session_id]
+
+    @staticmethod
+    def _config(session_id):
+        return {"configurable": {"session_id": session_id}}
+
+    async def turn(self, session_id, text):
+        async with self._session(session_id):
+            result = await self.graph.ainvoke({"input": text}, config=self._config(session_id))
+        return result["messages"][-1].content
+
+    async def stream_turn(self, session_id, text):
+        """Yields the answer's text as the model produces it."""
+        async with self._session(session_id):
+            async for message, _ in self.graph.astream(
+                {"input": text}, config=self._config(session_id), stream_mode="messages"
+            ):
+                if isinstance(message, AIMessageChunk) and message.content:
+                    yield message.content
+
+    def active_sessions(self):
+        return len(self._locks)
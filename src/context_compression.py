@@ -0,0 +1,131 @@
+import os
+import re
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import Document
+from langchain_core.documents.compressor import BaseDocumentCompressor
+
+import metrics
+from chat_memory import estimate_tokens
+from hybrid_retrieval import tokenize
+
+TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# PDF text often has no punctuation for pages at a time, so long runs are cut up too
+MAX_SENTENCE_CHARS = 400
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def split_sentences(text, max_chars=MAX_SENTENCE_CHARS):
+    sentences = []
+    for part in SENTENCE_END_RE.split(text):
+        part = " ".join(part.split())
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            sentences.append(part[:cut])
+            part = part[cut:].lstrip()
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+def dedupe_sentences(sentences):
+    """Drop repeated sentences and fragments of longer ones, e.g. from chunk_overlap regions.
+
+    sentences is a list of (doc_index, position, text); the longest copy wins.
+    """
+    kept = []
+    seen = "\x00"
+    for item in sorted(sentences, key=lambda item: -len(item[2])):
+        key = item[2].lower()
+        if key in seen:
+            continue
+        kept.append(item)
+        seen += key + "\x00"
+    return kept
+
+
+def lexical_scores(sentences, query):
+    query_terms = set(tokenize(query))
+    scores = []
+    for sentence in sentences:
+        terms = tokenize(sentence)
+        scores.append(len(query_terms.intersection(terms)) / (len(terms) ** 0.5 or 1))
+    return np.array(scores, dtype="float32")
+
+
+def chunk_scores(embedding, documents, query):
+    """Similarity of the question to each retrieved chunk, from the vectors stored at ingest.
+
+    Only vectors already in the embedding cache are used, so no chunk or
+    sentence is embedded here. Chunks without one get the mean of the
+    others; None if none is cached.
+    """
+    lookup = getattr(embedding, "lookup", None)
+    vectors = lookup([doc.page_content for doc in documents]) if lookup else [None] * len(documents)
+    known = [i for i, vector in enumerate(vectors) if vector is not None]
+    if not known:
+        return None
+    # The query vector is the one retrieval just computed, so it comes from the embedding cache too
+    query_vector = np.asarray(embedding.embed_query(query), dtype="float32")
+    matrix = np.asarray([vectors[i] for i in known], dtype="float32")
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1)
+    similarity = matrix @ query_vector / np.where(norms == 0, 1, norms)
+    scores = np.full(len(documents), similarity.mean(), dtype="float32")
+    scores[known] = similarity
+    return scores
+
+
+class ContextCompressor(BaseDocumentCompressor):
+    """Cuts retrieved chunks down to the sentences most relevant to the question.
+
+    Overlapping text is removed first; if what is left is still over
+    token_budget, sentences are ranked by their token overlap with the
+    question plus their chunk's embedding similarity to it, and the best are
+    kept, in their original order, until the budget is spent.
+    """
+
+    embedding: Optional[Any] = None
+    token_budget: int = TOKEN_BUDGET
+
+    def compress_documents(self, documents: Sequence[Document], query: str, callbacks: Callbacks = None) -> Sequence[Document]:
+        if not documents:
+            return []
+        with metrics.span("compress", chunks=len(documents)) as current:
+            sentences = dedupe_sentences([
+                (doc_index, position, sentence)
+                for doc_index, doc in enumerate(documents)
+                for position, sentence in enumerate(split_sentences(doc.page_content))
+            ])
+            tokens = [estimate_tokens(text) for _, _, text in sentences]
+
+            if sum(tokens) > self.token_budget:
+                texts = [text for _, _, text in sentences]
+                scores = lexical_scores(texts, query)
+                by_chunk = chunk_scores(self.embedding, documents, query) if self.embedding is not None else None
+                if by_chunk is not None:
+                    # Sentences share their chunk's similarity; token overlap ranks them within it
+                    scores = scores / (scores.max() or 1) + by_chunk[[doc_index for doc_index, _, _ in sentences]]
+                selected = []
+                used = 0
+                for i in np.argsort(-scores, kind="stable"):
+                    if used + tokens[i] <= self.token_budget:
+                        selected.append(sentences[i])
+                        used += tokens[i]
+                sentences = selected
+
+            by_doc = {}
+            for doc_index, position, text in sorted(sentences):
+                by_doc.setdefault(doc_index, []).append(text)
+            compressed = [
+                Document(page_content=" ".join(by_doc[doc_index]), metadata=dict(documents[doc_index].metadata))
+                for doc_index in sorted(by_doc)
+            ]
+            tokens_in = sum(estimate_tokens(doc.page_content) for doc in documents)
+            tokens_out = sum(estimate_tokens(doc.page_content) for doc in compressed)
+            current.set(tokens_in=tokens_in, tokens_out=tokens_out)
+        metrics.count("compress.tokens_saved", max(0, tokens_in - tokens_out))
+        return compressed
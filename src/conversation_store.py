@@ -0,0 +1,129 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from chat_memory import new_memory_state
+
+STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "conversations.sqlite3")
+
+
+class ConversationStore:
+    """SQLite store for day10's conversations, their messages and documents.
+
+    Every conversation belongs to an owner, and listing, loading, creating
+    and deleting are scoped to it, so users of one server only see their
+    own. load() returns a small header (name, index location, memory,
+    pending jobs); messages and documents are read separately, only for the
+    conversation on screen.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                name TEXT NOT NULL,
+                persist_dir TEXT NOT NULL,
+                index_version INTEGER NOT NULL DEFAULT 0,
+                memory TEXT NOT NULL,
+                jobs TEXT NOT NULL DEFAULT '[]',
+                created REAL NOT NULL,
+                UNIQUE (owner, name)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                ai TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (conversation_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+                name TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                added REAL NOT NULL,
+                PRIMARY KEY (conversation_id, name)
+            );"""
+        )
+        self._conn.commit()
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor
+
+    def _fetchall(self, query, params=()):
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def list_conversations(self, owner):
+        rows = self._fetchall("SELECT id, name FROM conversations WHERE owner = ? ORDER BY created", (owner,))
+        return [(row["id"], row["name"]) for row in rows]
+
+    def persist_dirs(self):
+        """Index directories of every owner's conversations, for housekeeping."""
+        return [row["persist_dir"] for row in self._fetchall("SELECT persist_dir FROM conversations")]
+
+    def create(self, owner, name, persist_dir):
+        conversation_id = uuid.uuid4().hex
+        try:
+            self._execute(
+                "INSERT INTO conversations (id, owner, name, persist_dir, memory, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, owner, name, persist_dir, json.dumps(new_memory_state()), time.time()),
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Conversation '{name}' already exists")
+        return conversation_id
+
+    def load(self, conversation_id, owner):
+        rows = self._fetchall("SELECT * FROM conversations WHERE id = ? AND owner = ?", (conversation_id, owner))
+        if not rows:
+            return None
+        conversation = dict(rows[0])
+        conversation["memory"] = json.loads(conversation["memory"])
+        conversation["jobs"] = json.loads(conversation["jobs"])
+        return conversation
+
+    def update(self, conversation_id, **fields):
+        for name in ("memory", "jobs"):
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE conversations SET {assignments} WHERE id = ?", [*fields.values(), conversation_id])
+
+    def delete(self, conversation_id, owner):
+        self._execute("DELETE FROM conversations WHERE id = ? AND owner = ?", (conversation_id, owner))
+
+    def messages(self, conversation_id):
+        rows = self._fetchall("SELECT user, ai FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,))
+        return [(row["user"], row["ai"]) for row in rows]
+
+    def add_message(self, conversation_id, user, ai):
+        self._execute(
+            """INSERT INTO messages (conversation_id, seq, user, ai, created)
+            VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE conversation_id = ?), ?, ?, ?)""",
+            (conversation_id, conversation_id, user, ai, time.time()),
+        )
+
+    def documents(self, conversation_id):
+        rows = self._fetchall("SELECT name, chunks FROM documents WHERE conversation_id = ? ORDER BY added", (conversation_id,))
+        return [{"name": row["name"], "chunks": row["chunks"]} for row in rows]
+
+    def set_document(self, conversation_id, name, chunks):
+        self._execute(
+            "INSERT OR REPLACE INTO documents (conversation_id, name, chunks, added) VALUES (?, ?, ?, ?)",
+            (conversation_id, name, chunks, time.time()),
+        )
+
+    def remove_document(self, conversation_id, name):
+        self._execute("DELETE FROM documents WHERE conversation_id = ? AND name = ?", (conversation_id, name))
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+import metrics
+from streaming import stream_llm
+
+# always: condense whenever there is history (what ConversationalRetrievalChain does)
+# skip: don't condense self-contained questions
+CONDENSE_MODE = os.getenv("RAG_CONDENSE_MODE", "skip")
+CONDENSE_CACHE_SIZE = 512
+# Follow-ups refer to the last few exchanges; only those go into the condense prompt and its cache key
+CONDENSE_TURNS = int(os.getenv("RAG_CONDENSE_TURNS", "3"))
+
+FOLLOW_UP_STARTS = ("and ", "but ", "so ", "also ", "what about", "how about", "why", "then ")
+REFERRING_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "she",
+    "him", "her", "his", "hers", "above", "previous", "earlier", "former", "latter", "same", "again",
+}
+
+
+def is_self_contained(question):
+    words = re.findall(r"[a-z']+", question.lower())
+    if len(words) < 4:
+        return False
+    if question.lower().lstrip().startswith(FOLLOW_UP_STARTS):
+        return False
+    return not REFERRING_WORDS.intersection(words)
+
+
+def recent_turns(messages, turns=CONDENSE_TURNS):
+    """The last `turns` exchanges of a chat history, leaving out system messages such as a summary."""
+    grouped = []
+    for message in messages:
+        if isinstance(message, (tuple, list)) or message.type == "human" or not grouped:
+            grouped.append([message])
+        else:
+            grouped[-1].append(message)
+    recent = [message for turn in grouped[-turns:] for message in turn]
+    return [m for m in recent if isinstance(m, (tuple, list)) or m.type != "system"]
+
+
+def format_history(messages):
+    lines = []
+    for message in messages:
+        if isinstance(message, (tuple, list)):
+            lines.append(f"Human: {message[0]}\nAssistant: {message[1]}")
+        elif message.type == "human":
+            lines.append(f"Human: {message.content}")
+        elif message.type == "ai":
+            lines.append(f"Assistant: {message.content}")
+        else:
+            lines.append(f"{message.type}: {message.content}")
+    return "\n".join(lines)
+
+
+class FastConversationalRAG:
+    """Conversational RAG that avoids the question-condensing round trip when it can.
+
+    Drop-in for ConversationalRetrievalChain's condense -> retrieve -> stuff
+    flow, using the same prompts. Questions are condensed against the last
+    CONDENSE_TURNS exchanges only, so the condensed question can be cached on
+    them and reused however the older history or its summary has changed;
+    in skip mode condensing is left out for questions that don't need it.
+    """
+
+    def __init__(self, llm, retriever, mode=CONDENSE_MODE, compressor=None):
+        if mode not in ("always", "skip"):
+            raise ValueError(f"Unknown condense mode: {mode}")
+        self.llm = llm
+        self.retriever = retriever
+        self.mode = mode
+        self.compressor = compressor
+        self.qa_prompt = PROMPT_SELECTOR.get_prompt(llm)
+        self._condensed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_key(self, question, history_text):
+        return hashlib.sha256(f"{history_text}\x00{question}".encode("utf-8")).hexdigest()
+
+    def condense(self, question, history_text, config=None):
+        key = self._cache_key(question, history_text)
+        with self._lock:
+            if key in self._condensed:
+                self._condensed.move_to_end(key)
+                metrics.count("condense.cache_hits")
+                return self._condensed[key], True
+
+        prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=history_text, question=question)
+        with metrics.span("condense"):
+            condensed = self.llm.invoke(prompt, config=config).content.strip() or question
+
+        with self._lock:
+            self._condensed[key] = condensed
+            if len(self._condensed) > CONDENSE_CACHE_SIZE:
+                self._condensed.popitem(last=False)
+        return condensed, False
+
+    def retrieve(self, question, config=None):
+        return self.retriever.invoke(question, config=config)
+
+    def prepare(self, question, chat_history, callbacks=None):
+        """Work out the standalone question and retrieve documents for it."""
+        standalone, docs, info = self._prepare(question, chat_history, callbacks)
+        if self.compressor is not None:
+            docs = self.compressor.compress_documents(docs, standalone, callbacks=callbacks)
+        return standalone, docs, info
+
+    def _prepare(self, question, chat_history, callbacks):
+        config = {"callbacks": callbacks} if callbacks else None
+        history_text = format_history(recent_turns(chat_history))
+        info = {"condensed": False, "cache_hit": False}
+
+        if not history_text or (self.mode != "always" and is_self_contained(question)):
+            return question, self.retrieve(question, config), info
+
+        standalone, info["cache_hit"] = self.condense(question, history_text, config)
+        info["condensed"] = True
+        return standalone, self.retrieve(standalone, config), info
+
+    def prompt_messages(self, question, docs):
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return self.qa_prompt.format_messages(context=context, question=question)
+
+    def stream(self, standalone, docs, callbacks=None):
+        return stream_llm(self.llm, self.prompt_messages(standalone, docs), callbacks)
+
+    def invoke(self, question, chat_history, callbacks=None):
+        standalone, docs, info = self.prepare(question, chat_history, callbacks)
+        config = {"callbacks": callbacks} if callbacks else None
+        answer = self.llm.invoke(self.prompt_messages(standalone, docs), config=config).content
+        return {"answer": answer, "source_documents": docs, "generated_question": standalone, **info}
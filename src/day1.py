@@ -1,8 +1,9 @@
-from google import genai
 from dotenv import load_dotenv
 import os
 
 def run_day1():
+    from google import genai
+
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
     
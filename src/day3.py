@@ -1,10 +1,30 @@
 from dotenv import load_dotenv
+import asyncio
+import csv
+import json
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 import re
 
+from summarizer import MapReduceSummarizer, SummaryCache
+
+# Requests in flight at once in batch mode
+BATCH_CONCURRENCY = int(os.getenv("DAY3_BATCH_CONCURRENCY", "8"))
+
+QNA_PROMPT = PromptTemplate(
+    input_variables=["question"],
+    template="You are a helpful AI assistant. Answer the following question:\n\nQuestion: {question}"
+)
+SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["text"],
+    template="Summarize the following text in 3-4 sentences:\n\n{text}"
+)
+# Batch mode: prompt and the input field it fills, per mode
+BATCH_MODES = {"qna": (QNA_PROMPT, "question"), "summarize": (SUMMARY_PROMPT, "text")}
+
 def init_gemini():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
@@ -19,24 +39,17 @@ def init_gemini():
 def qna_mode(llm):
     question = input("\n Enter your question: ")
 
-    template = PromptTemplate(
-        input_variables=["question"],
-        template="You are a helpful AI assistant. Answer the following question:\n\nQuestion: {question}"
-    )
-    prompt = template.format(question=question)
+    prompt = QNA_PROMPT.format(question=question)
     response = llm.invoke(prompt)
     print("\n Answer:\n", clean_output(response.content))
 
 def summarize_mode(llm):
     text = input("\n Paste the text you want to summarize:\n")
 
-    template = PromptTemplate(
-        input_variables=["text"],
-        template="Summarize the following text in 3-4 sentences:\n\n{text}"
-    )
-    prompt = template.format(text=text)
-    response = llm.invoke(prompt)
-    print("\n Answer:\n", clean_output(response.content))
+    # Long texts are summarized chunk by chunk; unchanged chunks come from the cache
+    summarizer = MapReduceSummarizer(llm, cache=SummaryCache(), final_prompt=SUMMARY_PROMPT)
+    summary = summarizer.summarize(text)
+    print("\n Answer:\n", clean_output(summary))
 
 def clean_output(text: str) -> str:
     text = re.sub(r'[*_`#>]', '', text)
@@ -50,20 +63,126 @@ def clean_output(text: str) -> str:
 
     return text.strip()
 
+def parse_jsonl_row(line):
+    # A bad line becomes a record carrying the error, so it fails alone instead of ending the batch
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"_error": f"invalid JSON: {e}"}
+    if not isinstance(row, dict):
+        return {"_error": "not a JSON object"}
+    return row
+
+def read_batch(path):
+    """Yields records from a .jsonl or .csv file, each with an id (its row number if it has none)."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (parse_jsonl_row(line) for line in f if line.strip())
+        for number, row in enumerate(rows, 1):
+            row.setdefault("id", str(number))
+            row["id"] = str(row["id"])
+            yield row
+
+def completed_ids(output_path):
+    """Ids already answered in a previous run's output, so a restarted batch skips them."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short when the last run was killed
+            if "output" in record:
+                done.add(record["id"])
+    return done
+
+async def run_batch(llm, mode, input_path, output_path, max_concurrency=BATCH_CONCURRENCY, progress=None):
+    """Runs every record of input_path through the mode's prompt, appending JSONL results as they finish.
+
+    Failed records are written with an error and retried by the next run on
+    the same output file, as is anything the previous run didn't reach.
+    """
+    prompt, field = BATCH_MODES[mode]
+    summarizer = None
+    if mode == "summarize":
+        # Shared by every worker, so its concurrency limit covers the whole batch's chunk calls
+        summarizer = MapReduceSummarizer(llm, cache=SummaryCache(), max_concurrency=max_concurrency, final_prompt=SUMMARY_PROMPT)
+    done = completed_ids(output_path)
+    pending = (row for row in read_batch(input_path) if row["id"] not in done)
+    counts = {"done": 0, "failed": 0, "skipped": len(done)}
+
+    partial = False
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            partial = f.read(1) != b"\n"
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        if partial:
+            # The last run was killed mid-write; start on a fresh line
+            out.write("\n")
+
+        async def worker():
+            # Workers pull from the shared generator, so only max_concurrency records are in memory
+            for row in pending:
+                record = {"id": row["id"]}
+                try:
+                    if "_error" in row:
+                        raise ValueError(row["_error"])
+                    if not row.get(field):
+                        raise ValueError(f"missing '{field}'")
+                    if mode == "summarize":
+                        answer = await summarizer.asummarize(row[field])
+                    else:
+                        answer = (await llm.ainvoke(prompt.format(**{field: row[field]}))).content
+                    record["output"] = clean_output(answer)
+                    counts["done"] += 1
+                except Exception as e:
+                    record["error"] = str(e)
+                    counts["failed"] += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if progress:
+                    progress(counts)
+
+        await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+    return counts
+
+def batch_mode(llm):
+    mode = input("\n Mode (qna/summarize): ").strip().lower()
+    if mode not in BATCH_MODES:
+        print("Invalid mode.")
+        return
+    input_path = input(f" Input file (.jsonl or .csv with a '{BATCH_MODES[mode][1]}' field): ").strip()
+    output_path = input(" Output file (.jsonl; an existing one is resumed): ").strip()
+
+    def progress(counts):
+        print(f"\r {counts['done']} done, {counts['failed']} failed", end="", flush=True)
+
+    counts = asyncio.run(run_batch(llm, mode, input_path, output_path, progress=progress))
+    print(f"\n Finished: {counts['done']} done, {counts['failed']} failed, {counts['skipped']} already done.")
+
 def run_day3():
     llm = init_gemini()
     while True:
         print("\n--- Chatbot Modes ---")
         print("1. Q&A")
         print("2. Summarization")
-        print("3. Exit")
-        choice = input("Choose a mode (1/2/3): ").strip()
+        print("3. Batch file")
+        print("4. Exit")
+        choice = input("Choose a mode (1/2/3/4): ").strip()
 
         if choice == "1":
             qna_mode(llm)
         elif choice == "2":
             summarize_mode(llm)
         elif choice == "3":
+            batch_mode(llm)
+        elif choice == "4":
             print("Exiting chatbot. Goodbye!")
             break
         else:
@@ -1,44 +1,113 @@
 import streamlit as st
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
-
+from answer_cache import AnswerCache
+from context_compression import ContextCompressor
+from embedding_cache import get_embeddings
+from faiss_index import set_search_params
+from hybrid_retrieval import KeywordIndex, hybrid_retriever, keyword_index_path
+from index_registry import IndexRegistry
+from ingest import ingest_faiss, iter_chunks
+from ingest_jobs import IngestWorker, JobQueue, building_index, current_index_dir, render_jobs
+from pdf_pipeline import extract_pages
+from streaming import render_sources, stream_stuff_answer
+
+# The Gemini clients read GOOGLE_API_KEY themselves
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+INDEX_DIR = "faiss_index"
 
 def get_pdf_text(pdf_docs):
-    text = ""
-    for pdf in pdf_docs:
-        reader = PdfReader(pdf)
-        for page in reader.pages:
-            text += page.extract_text()
-    return text
+    return extract_pages(pdf_docs)
+
 
+def get_text_chunks(pages):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-def get_text_chunks(text):
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=10000,
         chunk_overlap=1000,
     )
-    chunks = text_splitter.split_text(text)
-    return chunks
+    return (doc.page_content for doc in iter_chunks(pages, text_splitter))
+
+
+@st.cache_resource
+def load_embeddings():
+    return get_embeddings("models/embedding-001")
+
+
+def index_exists():
+    return os.path.exists(os.path.join(current_index_dir(INDEX_DIR), "index.faiss"))
+
+
+def index_version():
+    return os.path.getmtime(os.path.join(current_index_dir(INDEX_DIR), "index.faiss"))
+
+
+@st.cache_resource(max_entries=1)
+def load_vector_store(version):
+    from langchain_community.vectorstores import FAISS
+
+    # version is only part of the cache key: a rebuilt index gets a new mtime
+    vector_store = FAISS.load_local(current_index_dir(INDEX_DIR), load_embeddings(), allow_dangerous_deserialization=True)
+    set_search_params(vector_store.index)
+    return vector_store
+
+
+@st.cache_resource(max_entries=1)
+def load_keyword_index(version):
+    return KeywordIndex.load(keyword_index_path(current_index_dir(INDEX_DIR)))
+
 
+def get_vector_store(text_chunks, index_dir=INDEX_DIR, progress=None):
+    embeddings = load_embeddings()
+    keyword_index = KeywordIndex()
+    vector_store = ingest_faiss(text_chunks, embeddings, progress=progress, keyword_index=keyword_index)
+    if vector_store is None:
+        raise ValueError("No text could be extracted from the uploaded files.")
+    vector_store.save_local(index_dir)
+    keyword_index.save(keyword_index_path(index_dir))
 
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
 
+def build_index_job(payload, job):
+    # Runs on the ingest worker; the new index only replaces the live one once it is complete
+    pages = get_pdf_text(payload["files"])
+    text_chunks = get_text_chunks(pages)
+    with building_index(INDEX_DIR, job.id) as index_dir:
+        get_vector_store(text_chunks, index_dir, progress=lambda n: job.progress(n, f"{n} chunks embedded"))
+    return {"files": [os.path.basename(path) for path in payload["files"]]}
 
+
+@st.cache_resource
+def get_ingest_worker():
+    worker = IngestWorker(JobQueue())
+    worker.register("faiss_rebuild", build_index_job)
+    return worker.start()
+
+
+@st.cache_resource
+def get_index_registry():
+    registry = IndexRegistry()
+    registry.register(INDEX_DIR, "faiss")
+    return registry
+
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(load_embeddings())
+
+
+@st.cache_resource
+def get_context_compressor():
+    return ContextCompressor(embedding=load_embeddings())
+
+
+@st.cache_resource
 def get_conversational_chain():
+    from langchain.chains.question_answering import load_qa_chain
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     prompt_template = """
     Answer the question as detailed as possible from the provided context, make sure to provide all the details, if the answer is not in
     provided context just say, "answer is not available in the context", don't provide the wrong answer\n\n
@@ -56,20 +125,30 @@ def get_conversational_chain():
 
 
 def user_input(user_question):
-    embeddings = GoogleGenerativeAIEmbeddings(model = "models/embedding-001")
-    
-    new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(user_question)
+    if not index_exists():
+        st.warning("Upload your PDF files and click Submit & Process first.")
+        return
 
-    chain = get_conversational_chain()
+    version = index_version()
+    answers = get_answer_cache()
+    cached = answers.lookup(INDEX_DIR, version, user_question)
+    if cached:
+        render_sources(cached.sources)
+        st.write("Reply: ", cached.answer)
+        return
 
-    
-    response = chain(
-        {"input_documents":docs, "question": user_question}
-        , return_only_outputs=True)
+    new_db = load_vector_store(version)
+    docs = hybrid_retriever(new_db, load_keyword_index(version)).invoke(user_question)
+    docs = get_context_compressor().compress_documents(docs, user_question)
+
+    render_sources(docs)
+
+    chain = get_conversational_chain()
 
-    print(response)
-    st.write("Reply: ", response["output_text"])
+    st.write("Reply: ")
+    answer = st.write_stream(stream_stuff_answer(chain, docs, user_question))
+    answers.store(INDEX_DIR, version, user_question, answer, docs)
+    print(answer)
 
 
 def main():
@@ -84,12 +163,12 @@ def main():
     with st.sidebar:
         st.title("Menu:")
         pdf_docs = st.file_uploader("Upload your PDF Files and Click on the Submit & Process Button", accept_multiple_files=True)
-        if st.button("Submit & Process"):
-            with st.spinner("Processing..."):
-                raw_text = get_pdf_text(pdf_docs)
-                text_chunks = get_text_chunks(raw_text)
-                get_vector_store(text_chunks)
-                st.success("Done")
+        worker = get_ingest_worker()
+        get_index_registry()
+        if st.button("Submit & Process") and pdf_docs:
+            worker.submit("faiss_rebuild", INDEX_DIR, files=pdf_docs)
+            st.success("Queued. You can keep asking questions while it is processed.")
+        render_jobs(worker.queue, INDEX_DIR)
 
 
 
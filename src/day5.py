@@ -1,10 +1,12 @@
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
-import os, shutil
+from embedding_cache import get_embeddings
+from index_registry import IndexRegistry
+from ingest import sync_documents
 
 def run_day5():
+    from langchain_chroma import Chroma
+
     load_dotenv()
 
     docs = [
@@ -15,15 +17,13 @@ def run_day5():
         Document(page_content="Ravindra Jadeja is a dynamic all-rounder who contributes with both bat and ball. Representing Chennai Super Kings, his quick fielding and match-winning performances make him a key player.", metadata={"team": "Chennai Super Kings"}),
     ]
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    persist_dir = "chroma_db"
-
-    if os.path.exists(persist_dir):
-        shutil.rmtree(persist_dir)
-
-    vectorstore = Chroma.from_documents(docs, embedding=embeddings, persist_directory=persist_dir)
+    embeddings = get_embeddings("models/embedding-001")
+    persist_dir = "chroma_day5"
+    IndexRegistry().register(persist_dir, "day5")
 
+    # Reuses the store from the last run; only documents that changed are embedded again
     vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+    sync_documents(vectorstore, docs)
 
     query = input("\n Enter your cricket-related question: ")
 
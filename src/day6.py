@@ -1,11 +1,15 @@
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
-import os, shutil
+from embedding_cache import get_embeddings
+from hybrid_retrieval import KeywordIndex, hybrid_retriever
+from index_registry import IndexRegistry
+from ingest import sync_documents
 
 def run_day6():
+    from langchain.chains import RetrievalQA
+    from langchain_chroma import Chroma
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     load_dotenv()
 
     docs = [
@@ -16,17 +20,18 @@ def run_day6():
         Document(page_content="Jupiter is the largest planet in the solar system and is famous for its Great Red Spot.", metadata={"planet": "Jupiter"}),
     ]
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+    embeddings = get_embeddings("models/embedding-001")
     persist_dir = "chroma_day6"
+    IndexRegistry().register(persist_dir, "day6")
 
-    if os.path.exists(persist_dir):
-        shutil.rmtree(persist_dir)
-
-    vectorstore = Chroma.from_documents(docs, embedding=embeddings, persist_directory=persist_dir)
-
+    # Reuses the store from the last run; only documents that changed are embedded again
     vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+    sync_documents(vectorstore, docs)
+
+    keyword_index = KeywordIndex()
+    keyword_index.add(docs, [doc.metadata["planet"] for doc in docs])
 
-    retriever = vectorstore.as_retriever(search_type="mmr", search_kwargs={"k": 2})
+    retriever = hybrid_retriever(vectorstore, keyword_index, k=2, search_type="mmr")
 
     llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
 
@@ -1,53 +1,21 @@
-from langgraph.graph import END, StateGraph
-from langchain_core.runnables import Runnable
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
-from typing import TypedDict
 
-import os
+from chat_server import build_chat_graph
+from session_store import SessionStore
 
-load_dotenv()
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7)
+# Bounded by SESSION_MAX / SESSION_TTL_SECONDS / SESSION_MAX_TOTAL_TOKENS; set SESSION_SPILL_PATH to keep evicted sessions
+sessions = SessionStore()
 
-memory_store = {}
+def get_llm():
+    # Imported here so loading the module doesn't pay for the Gemini client
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-def get_memory(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in memory_store:
-        memory_store[session_id] = InMemoryChatMessageHistory()
-    return memory_store[session_id]
-
-def respond(state: dict) -> dict:
-    history = get_memory(state["config"]["session_id"])
-    user_message = HumanMessage(content=state["input"])
-
-    history.add_message(user_message)
-
-    messages = history.messages
-    response = llm.invoke(messages)
-
-    history.add_message(response)
-
-    return {
-        "messages": messages + [user_message, response],
-        "config": state["config"],
-    }
-
-class ChatState(TypedDict):
-    input: str
-    config: dict
-    messages: list
-
-graph = StateGraph(ChatState)
-graph.add_node("respond", respond)
-graph.set_entry_point("respond")
-graph.add_edge("respond", END)
-
-chatbot = graph.compile()
+    load_dotenv()
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7)
 
 def run_day7():
+    # Serve many sessions concurrently with chat_server.ChatServer(get_llm(), sessions)
+    chatbot = build_chat_graph(get_llm(), sessions)
     print(" LangGraph + Gemini chatbot with memory. Type 'exit' to quit.")
     session_id = "user-123"
 
@@ -56,10 +24,12 @@ def run_day7():
         if user_input.lower() == "exit":
             break
 
-        result = chatbot.invoke({
-            "input": user_input,
-            "config": {"session_id": session_id}
-        })
+        result = chatbot.invoke(
+            {"input": user_input},
+            config={"configurable": {"session_id": session_id}}
+        )
 
         ai_response = result["messages"][-1]
         print(" AI:", ai_response.content)
+
+    sessions.flush()
@@ -1,55 +1,113 @@
 import streamlit as st
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_google_genai import (
-    GoogleGenerativeAIEmbeddings,
-    ChatGoogleGenerativeAI
-)
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_core.documents import Document
 from dotenv import load_dotenv
+from answer_cache import AnswerCache
+from context_compression import ContextCompressor
+from embedding_cache import get_embeddings
+from hybrid_retrieval import KeywordIndex, hybrid_retriever, keyword_index_path
+from index_registry import IndexRegistry
+from ingest import ingest_documents, iter_chunks
+from ingest_jobs import (
+    IngestWorker, JobQueue, building_index, current_index_dir, index_version, publish_index_dir, render_jobs,
+)
+from pdf_pipeline import extract_pages
+from streaming import render_sources, stream_stuff_answer
 import os
-import shutil
 
 load_dotenv()
 persist_dir = "chroma_db"
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.4)
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
 
-def process_pdfs(pdfs):
-    raw_text = ""
-    for pdf in pdfs:
-        reader = PdfReader(pdf)
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                raw_text += text
+# Clients are built on first use and kept across reruns, so a page load doesn't wait on them
+@st.cache_resource
+def get_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = splitter.split_text(raw_text)
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.4)
 
-    docs = [Document(page_content=chunk) for chunk in chunks]
 
-    vectorstore = Chroma.from_documents(
-        docs,
-        embedding=embedding,
-        persist_directory=persist_dir
-    )
+@st.cache_resource
+def get_embedding():
+    return get_embeddings("models/embedding-001")
+
+
+def process_pdfs(pdfs, index_dir, progress=None):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_chroma import Chroma
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    docs = iter_chunks(extract_pages(pdfs), splitter)
 
-    st.success("✅ PDF processed and vectorstore updated!")
+    vectorstore = Chroma(persist_directory=index_dir, embedding_function=get_embedding())
+    keyword_index = KeywordIndex.load(keyword_index_path(index_dir))
+    # Stored under source:chunk ids, so running a batch again overwrites what a cancelled run left
+    ingest_documents(vectorstore, docs, with_ids=True, progress=progress, keyword_index=keyword_index)
+    keyword_index.save(keyword_index_path(index_dir))
     return vectorstore
 
 
+def process_pdfs_job(payload, job):
+    progress = lambda n: job.progress(n, f"{n} chunks embedded")
+    if index_version(persist_dir) is None:
+        # First batch (or a store from before versioning): build a version to publish
+        with building_index(persist_dir, job.id, copy_current=True) as index_dir:
+            process_pdfs(payload["files"], index_dir, progress=progress)
+    else:
+        # The store only grows and the worker is its only writer, so later batches are added in
+        # place instead of copying the whole store; republishing tells readers it changed
+        index_dir = current_index_dir(persist_dir)
+        process_pdfs(payload["files"], index_dir, progress=progress)
+        publish_index_dir(persist_dir, index_dir)
+    return {"files": [os.path.basename(path) for path in payload["files"]]}
+
+
+@st.cache_resource
+def get_ingest_worker():
+    worker = IngestWorker(JobQueue())
+    worker.register("chroma_add", process_pdfs_job)
+    return worker.start()
+
+
+@st.cache_resource(max_entries=2)
+def open_vectorstore(index_dir):
+    # Batches added in place show up through the same client, so the path alone is a safe key
+    from langchain_chroma import Chroma
+
+    return Chroma(persist_directory=index_dir, embedding_function=get_embedding())
+
+
 def get_vectorstore():
-    if os.path.exists(persist_dir):
-        return Chroma(persist_directory=persist_dir, embedding_function=embedding)
+    index_dir = current_index_dir(persist_dir)
+    if os.path.exists(index_dir):
+        return open_vectorstore(index_dir)
     return None
 
+
+@st.cache_resource
+def get_index_registry():
+    registry = IndexRegistry()
+    registry.register(persist_dir, "day8")
+    return registry
+
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(get_embedding())
+
+
+@st.cache_resource(max_entries=1)
+def load_keyword_index(version):
+    # version is only part of the cache key: every publish changes it
+    return KeywordIndex.load(keyword_index_path(current_index_dir(persist_dir)))
+
 def get_qa_chain(vstore):
-    retriever = vstore.as_retriever()
+    from langchain.chains import RetrievalQA
+    from langchain.retrievers import ContextualCompressionRetriever
+
+    retriever = ContextualCompressionRetriever(
+        base_compressor=ContextCompressor(embedding=get_embedding()),
+        base_retriever=hybrid_retriever(vstore, load_keyword_index(index_version(persist_dir))),
+    )
     prompt_template = PromptTemplate(
         input_variables=["context", "question"],
         template="""
@@ -66,7 +124,7 @@ Answer:
     )
 
     return RetrievalQA.from_chain_type(
-        llm=llm,
+        llm=get_llm(),
         retriever=retriever,
         chain_type="stuff",
         chain_type_kwargs={"prompt": prompt_template}
@@ -78,8 +136,12 @@ st.title("📄 Chat with Your PDF (Gemini + Chroma)")
 with st.sidebar:
     st.header("📂 Upload PDFs")
     uploaded_pdfs = st.file_uploader("Choose PDFs", type="pdf", accept_multiple_files=True)
+    worker = get_ingest_worker()
+    get_index_registry()
     if st.button("Process PDFs") and uploaded_pdfs:
-        process_pdfs(uploaded_pdfs)
+        worker.submit("chroma_add", persist_dir, files=uploaded_pdfs)
+        st.success("✅ PDFs queued. You can keep chatting while they are processed.")
+    render_jobs(worker.queue, persist_dir)
 
 vstore = get_vectorstore()
 if vstore:
@@ -88,14 +150,26 @@ if vstore:
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
+    for speaker, text in st.session_state.chat_history:
+        st.markdown(f"**{'🧑‍💻' if speaker == 'You' else '🤖'} {speaker}:** {text}")
+
     query = st.text_input("💬 Ask a question from your PDFs:")
 
     if st.button("Send") and query:
-        answer = qa_chain.run(query)
+        st.markdown(f"**🧑‍💻 You:** {query}")
+        version = index_version(persist_dir)
+        cached = get_answer_cache().lookup(persist_dir, version, query)
+        if cached:
+            render_sources(cached.sources)
+            answer = cached.answer
+            st.markdown(f"**🤖 AI:** {answer}")
+        else:
+            docs = qa_chain.retriever.invoke(query)
+            render_sources(docs)
+            st.markdown("**🤖 AI:**")
+            answer = st.write_stream(stream_stuff_answer(qa_chain.combine_documents_chain, docs, query))
+            get_answer_cache().store(persist_dir, version, query, answer, docs)
         st.session_state.chat_history.append(("You", query))
         st.session_state.chat_history.append(("AI", answer))
-
-    for speaker, text in st.session_state.chat_history:
-        st.markdown(f"**{'🧑‍💻' if speaker == 'You' else '🤖'} {speaker}:** {text}")
 else:
     st.warning("👆 Upload and process a PDF to begin chatting.")
@@ -1,70 +1,100 @@
 import streamlit as st
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from langchain_core.documents import Document
 from dotenv import load_dotenv
+from answer_cache import AnswerCache
+from context_compression import ContextCompressor
+from embedding_cache import get_embeddings
+from hybrid_retrieval import KeywordIndex, hybrid_retriever, keyword_index_path
+from index_registry import IndexRegistry
+from ingest import ingest_documents, iter_chunks
+from ingest_jobs import IngestWorker, JobQueue, building_index, current_index_dir, index_version, render_jobs
+from pdf_pipeline import extract_pages
+from streaming import render_sources, stream_stuff_answer
 import os
-import shutil
-import gc
-import time
 import uuid
 
 load_dotenv()
-persist_dir = f"chroma_db_{uuid.uuid4().hex[:6]}"
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
-
-
-def process_pdfs(pdfs):
-    raw_text = ""
-    filenames = []
-
-    for pdf in pdfs:
-        filenames.append(pdf.name)
-        reader = PdfReader(pdf)
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                raw_text += text
-
-    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_text(raw_text)
-    documents = [Document(page_content=chunk) for chunk in chunks]
-
-    try:
-        if "vectorstore" in st.session_state:
-            st.session_state.vectorstore = None
-        existing = get_vectorstore()
-        if existing:
-            if hasattr(existing, "__del__"):
-                existing.__del__()
-            del existing
-        gc.collect()
-        time.sleep(1)
-        if os.path.exists(persist_dir):
-            shutil.rmtree(persist_dir)
-    except Exception as e:
-        new_name = f"{persist_dir}_{uuid.uuid4().hex[:6]}"
-        os.rename(persist_dir, new_name)
-        st.warning(f"⚠️ Old vectorstore renamed to `{new_name}` due to lock: {e}")
-
-    vectorstore = Chroma.from_documents(documents, embedding=embedding, persist_directory=persist_dir)
-    st.session_state.vectorstore = vectorstore
-    st.session_state.uploaded_files = filenames
-    st.success("✅ PDFs processed and embedded!")
+# One index per browser session; each Process run publishes a new version of it
+persist_dir = st.session_state.setdefault("persist_dir", f"chroma_db_{uuid.uuid4().hex[:6]}")
+# `python index_registry.py sweep` reclaims a session's index once it has gone unused this long
+SESSION_LEASE_SECONDS = 24 * 3600
+
+
+# Clients are built on first use and kept across reruns, so a page load doesn't wait on them
+@st.cache_resource
+def get_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
+
+
+@st.cache_resource
+def get_embedding():
+    return get_embeddings("models/embedding-001")
+
+
+def process_pdfs(pdfs, index_dir, progress=None):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_chroma import Chroma
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    documents = iter_chunks(extract_pages(pdfs), splitter)
+
+    # Each run builds a fresh version directory, so there is no locked old store to delete first
+    vectorstore = Chroma(persist_directory=index_dir, embedding_function=get_embedding())
+    keyword_index = KeywordIndex()
+    ingest_documents(vectorstore, documents, progress=progress, keyword_index=keyword_index)
+    keyword_index.save(keyword_index_path(index_dir))
     return vectorstore
 
 
+def process_pdfs_job(payload, job):
+    with building_index(payload["persist_dir"], job.id) as index_dir:
+        process_pdfs(payload["files"], index_dir, progress=lambda n: job.progress(n, f"{n} chunks embedded"))
+    return {"files": [os.path.basename(path) for path in payload["files"]]}
+
+
+@st.cache_resource
+def get_ingest_worker():
+    worker = IngestWorker(JobQueue())
+    worker.register("chroma_rebuild", process_pdfs_job)
+    return worker.start()
+
+
+@st.cache_resource(max_entries=32)
+def open_vectorstore(index_dir):
+    from langchain_chroma import Chroma
+
+    return Chroma(persist_directory=index_dir, embedding_function=get_embedding())
+
+
 def get_vectorstore():
-    if os.path.exists(persist_dir):
-        return Chroma(persist_directory=persist_dir, embedding_function=embedding)
+    index_dir = current_index_dir(persist_dir)
+    if os.path.exists(index_dir):
+        return open_vectorstore(index_dir)
     return None
 
 
+@st.cache_resource(max_entries=32)
+def load_keyword_index(index_dir):
+    # Published versions are never modified, so the path alone is a safe key
+    return KeywordIndex.load(keyword_index_path(index_dir))
+
+
+@st.cache_resource
+def get_index_registry():
+    return IndexRegistry()
+
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(get_embedding())
+
+
 def get_qa_chain(vstore):
+    from langchain.chains import RetrievalQA
+    from langchain.retrievers import ContextualCompressionRetriever
+
     prompt_template = PromptTemplate(
         input_variables=["context", "question"],
         template="""
@@ -80,8 +110,11 @@ Answer:
 """
     )
     return RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=vstore.as_retriever(),
+        llm=get_llm(),
+        retriever=ContextualCompressionRetriever(
+            base_compressor=ContextCompressor(embedding=get_embedding()),
+            base_retriever=hybrid_retriever(vstore, load_keyword_index(current_index_dir(persist_dir))),
+        ),
         chain_type="stuff",
         chain_type_kwargs={"prompt": prompt_template}
     )
@@ -94,18 +127,20 @@ with st.sidebar:
     st.header("Upload PDFs")
     uploaded_pdfs = st.file_uploader("Choose PDF files", type="pdf", accept_multiple_files=True)
 
+    worker = get_ingest_worker()
+    get_index_registry().register(persist_dir, "day9", lease=SESSION_LEASE_SECONDS)
     if st.button("📄 Process PDFs") and uploaded_pdfs:
-        try:
-            process_pdfs(uploaded_pdfs)
-        except Exception as e:
-            st.error(f"❌ Failed to process files: {e}")
+        worker.submit("chroma_rebuild", persist_dir, {"persist_dir": persist_dir}, files=uploaded_pdfs)
+        st.success("✅ PDFs queued. You can keep chatting while they are processed.")
+    render_jobs(worker.queue, persist_dir)
 
-    if st.session_state.get("uploaded_files"):
+    finished = [job for job in worker.queue.jobs(persist_dir) if job["status"] == "done"]
+    if finished:
         st.markdown("**📂 Uploaded Docs:**")
-        for fname in st.session_state.uploaded_files:
+        for fname in finished[0]["result"]["files"]:
             st.markdown(f"- `{fname}`")
 
-vstore = st.session_state.get("vectorstore") or get_vectorstore()
+vstore = get_vectorstore()
 
 if vstore:
     qa_chain = get_qa_chain(vstore)
@@ -113,14 +148,26 @@ if vstore:
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
+    for speaker, text in st.session_state.chat_history:
+        st.markdown(f"**{'🧑‍💻' if speaker == 'You' else '🤖'} {speaker}:** {text}")
+
     user_query = st.text_input("💬 Ask a question from your documents:")
 
     if st.button("Send") and user_query:
-        answer = qa_chain.run(user_query)
+        st.markdown(f"**🧑‍💻 You:** {user_query}")
+        version = index_version(persist_dir)
+        cached = get_answer_cache().lookup(persist_dir, version, user_query)
+        if cached:
+            render_sources(cached.sources)
+            answer = cached.answer
+            st.markdown(f"**🤖 AI:** {answer}")
+        else:
+            docs = qa_chain.retriever.invoke(user_query)
+            render_sources(docs)
+            st.markdown("**🤖 AI:**")
+            answer = st.write_stream(stream_stuff_answer(qa_chain.combine_documents_chain, docs, user_query))
+            get_answer_cache().store(persist_dir, version, user_query, answer, docs)
         st.session_state.chat_history.append(("You", user_query))
         st.session_state.chat_history.append(("AI", answer))
-
-    for speaker, text in st.session_state.chat_history:
-        st.markdown(f"**{'🧑‍💻' if speaker == 'You' else '🤖'} {speaker}:** {text}")
 else:
     st.info("👆 Upload and process PDFs to begin.")
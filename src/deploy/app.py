@@ -1,67 +1,197 @@
 import streamlit as st
 import uuid
 import os
-import shutil
-import gc
-import time
+from itertools import groupby
 
-from PyPDF2 import PdfReader
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-
-from langchain_chroma import Chroma
-from langchain_google_genai import (
-    GoogleGenerativeAIEmbeddings,
-    ChatGoogleGenerativeAI
-)
-from langchain.chains import ConversationalRetrievalChain
+from langchain_core.messages import HumanMessage
+
+import metrics
+from answer_cache import AnswerCache
+from chat_memory import ConversationMemory
+from conversation_store import ConversationStore
+from conversational_rag import FastConversationalRAG, is_self_contained
+from context_compression import ContextCompressor
+from embedding_cache import get_embeddings
+from hybrid_retrieval import KeywordIndex, keyword_index_path
+from index_registry import IndexRegistry
+from ingest import iter_chunks
+from ingest_jobs import IngestWorker, JobQueue, building_index, current_index_dir, remove_index, render_jobs
+from pdf_pipeline import extract_pages
+from resource_cache import ResourceCache
+from shared_store import SHARED_PERSIST_DIR, SharedChunkStore
+from streaming import render_sources, stream_llm
 
 load_dotenv()
 
-BASE_PERSIST_DIR = "chroma_db"
+# Per-conversation keyword index; the chunks themselves live in the shared store
+BASE_PERSIST_DIR = "conversation_index"
 EMBEDDING_MODEL = "models/embedding-001"
 LLM_MODEL = "gemini-2.0-flash"
 TEMPERATURE = 0.4
 
 
 
-def build_vectorstore(conv_data):
-    try:
-        if os.path.exists(conv_data["persist_dir"]):
-            shutil.rmtree(conv_data["persist_dir"])
-            time.sleep(0.1)
-            gc.collect()
-    except Exception as e:
-        st.warning(f"⚠️ Error clearing old vectorstore: {e}")
+def index_dir(conv_data):
+    return current_index_dir(conv_data["persist_dir"])
+
+
+def update_index_job(payload, job):
+    # New chunks stay invisible until commit(), which switches the conversation's references in one step
+    chunk_store = get_shared_store()
+    docs, added = [], []
+    removed = list(payload.get("remove", []))
+    with building_index(payload["persist_dir"], job.id, copy_current=True) as path:
+        keyword_index = KeywordIndex.load(keyword_index_path(path))
+        for name in removed:
+            keyword_index.remove_source(name)
+        for name, pages in groupby(extract_pages(payload.get("files", [])), key=lambda record: record[0]):
+            # Re-adding a file with the same name replaces its old chunks
+            keyword_index.remove_source(name)
+            removed.append(name)
+            refs = chunk_store.add(
+                iter_chunks(pages, get_splitter()), keyword_index=keyword_index,
+                progress=lambda n: job.progress(n, f"{name}: {n} chunks indexed")
+            )
+            added.extend(refs)
+            docs.append({"name": name, "chunks": len(refs)})
+        keyword_index.save(keyword_index_path(path))
+        chunk_store.commit(payload["conversation_id"], added, removed)
+    return {"docs": docs}
+
+
+def delete_conversation_job(payload, job):
+    chunk_store = get_shared_store()
+    chunk_store.drop_conversation(payload["conversation_id"])
+    remove_index(payload["persist_dir"])
+    index_registry.forget(payload["persist_dir"])
+    return {"collected": chunk_store.collect_garbage()}
+
+
+def queue_index_update(conv_data, files=(), remove=()):
+    job_id = ingest_worker.submit(
+        "conversation_update", conv_data["persist_dir"],
+        {"conversation_id": conv_data["id"], "persist_dir": conv_data["persist_dir"], "remove": list(remove)},
+        files=files
+    )
+    conv_data["jobs"].append(job_id)
+    conversations.update(conv_data["id"], jobs=conv_data["jobs"])
+
+
+def apply_finished_jobs(conv_data):
+    # conv_data["jobs"] is in submission order, which is the order the worker runs them in
+    jobs = [ingest_worker.queue.get(job_id) for job_id in conv_data["jobs"]]
+    pending = []
+    for position, job in enumerate(jobs):
+        if job is None:
+            continue
+        if job["status"] in ("queued", "running"):
+            pending.append(job["id"])
+        elif job["status"] == "done":
+            # A document removed after this job was queued stays removed, even though this job (re)added it
+            removed_later = {name for later in jobs[position + 1:] if later for name in later["payload"].get("remove", [])}
+            for doc in job["result"]["docs"]:
+                if doc["name"] not in removed_later:
+                    conversations.set_document(conv_data["id"], doc["name"], doc["chunks"])
+            index_changed(conv_data)
+    if pending != conv_data["jobs"]:
+        conv_data["jobs"] = pending
+        conversations.update(conv_data["id"], jobs=pending)
+
+
+def index_changed(conv_data):
+    conv_data["index_version"] += 1
+    conversations.update(conv_data["id"], index_version=conv_data["index_version"])
+    resources.invalidate(conv_data["persist_dir"])
+    get_answer_cache().invalidate(conv_data["persist_dir"])
+
+
+def get_rag_resources(conv_data):
+    def build():
+        with metrics.span("keyword_index.load"):
+            keyword_index = KeywordIndex.load(keyword_index_path(index_dir(conv_data)))
+        return FastConversationalRAG(
+            get_llm(), get_shared_store().as_retriever(conv_data["id"], keyword_index),
+            compressor=ContextCompressor(embedding=get_embedding())
+        )
+
+    return resources.get(conv_data["persist_dir"], conv_data["index_version"], build)
+
 
-    if not conv_data["uploaded_docs"]:
-        return
+# Clients are built on first use, so opening the app doesn't wait on them
+@st.cache_resource
+def get_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
-    all_docs = []
-    for name, text in conv_data["uploaded_docs"]:
-        chunks = splitter.split_text(text)
-        all_docs.extend([Document(page_content=chunk, metadata={"source": name}) for chunk in chunks])
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=TEMPERATURE)
+
+
+@st.cache_resource
+def get_embedding():
+    return get_embeddings(EMBEDDING_MODEL)
+
+
+@st.cache_resource
+def get_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+
+@st.cache_resource
+def get_resource_cache():
+    # One cache per server process, shared by every session's reruns
+    return ResourceCache()
+
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(get_embedding())
+
+
+@st.cache_resource
+def get_conversation_store():
+    return ConversationStore()
+
+
+@st.cache_resource
+def get_shared_store():
+    return SharedChunkStore(get_embedding())
+
+
+@st.cache_resource
+def get_index_registry():
+    # Conversation indexes hold no lease: they are kept until the conversation is deleted
+    registry = IndexRegistry()
+    registry.register(SHARED_PERSIST_DIR, "day10")
+    for persist_dir in get_conversation_store().persist_dirs():
+        registry.register(persist_dir, "day10")
+    return registry
 
-    Chroma.from_documents(
-        all_docs,
-        embedding=embedding,
-        persist_directory=conv_data["persist_dir"]
-    )
+
+@st.cache_resource
+def get_ingest_worker():
+    worker = IngestWorker(JobQueue())
+    worker.register("conversation_update", update_index_job)
+    worker.register("conversation_delete", delete_conversation_job)
+    return worker.start()
 
 st.set_page_config(page_title="🧠 RAG Chatbot", layout="wide")
 st.title("🤖 Welcome to RAGify")
 
-# Initialize session state
-if "conversations" not in st.session_state:
-    st.session_state.conversations = {}  
-
+# Session state only holds who the user is and the id of the open conversation; everything else is in the store
+if "owner" not in st.session_state:
+    # A random id, mirrored in the URL so a reload finds the same conversations; whoever has the link shares them
+    st.session_state.owner = st.query_params.get("owner") or uuid.uuid4().hex
+st.query_params["owner"] = st.session_state.owner
+owner = st.session_state.owner
 if "current_conversation" not in st.session_state:
     st.session_state.current_conversation = None
 
-embedding = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
-llm = ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=TEMPERATURE)
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+resources = get_resource_cache()
+conversations = get_conversation_store()
+index_registry = get_index_registry()
+ingest_worker = get_ingest_worker()
 
 with st.sidebar:
     st.header("💼 Conversations")
@@ -71,38 +201,41 @@ with st.sidebar:
     if st.button("Create Conversation"):
         if not new_conv_name.strip():
             st.warning("Please enter a valid name.")
-        elif new_conv_name in st.session_state.conversations:
-            st.warning("Conversation already exists!")
         else:
-            session_id = uuid.uuid4().hex
             persist_dir = f"{BASE_PERSIST_DIR}_{uuid.uuid4().hex[:8]}"
-            st.session_state.conversations[new_conv_name] = {
-                "session_id": session_id,
-                "chat_history": [],
-                "uploaded_docs": [],
-                "persist_dir": persist_dir,
-            }
-            st.session_state.current_conversation = new_conv_name
-            st.success(f"✅ Created conversation '{new_conv_name}'")
-
-    if st.session_state.conversations:
-        all_convs = list(st.session_state.conversations.keys())
+            try:
+                st.session_state.current_conversation = conversations.create(owner, new_conv_name, persist_dir)
+                index_registry.register(persist_dir, "day10")
+                st.success(f"✅ Created conversation '{new_conv_name}'")
+            except ValueError:
+                st.warning("Conversation already exists!")
+
+    all_convs = dict(conversations.list_conversations(owner))
+    if all_convs:
+        conv_ids = list(all_convs)
         selected = st.selectbox(
             "🔀 Switch conversation",
-            all_convs,
-            index=all_convs.index(st.session_state.current_conversation) if st.session_state.current_conversation in all_convs else 0
+            conv_ids,
+            format_func=all_convs.get,
+            index=conv_ids.index(st.session_state.current_conversation) if st.session_state.current_conversation in conv_ids else 0
         )
         st.session_state.current_conversation = selected
 
-        st.markdown(f"✅ **Current:** `{selected}`")
+        st.markdown(f"✅ **Current:** `{all_convs[selected]}`")
 
         if st.button("🗑️ Delete This Conversation"):
-            conv = st.session_state.conversations.pop(selected, None)
-            if conv and os.path.exists(conv["persist_dir"]):
-                try:
-                    shutil.rmtree(conv["persist_dir"])
-                except Exception as e:
-                    st.warning(f"⚠️ Error deleting vectorstore: {e}")
+            conv = conversations.load(selected, owner)
+            if conv:
+                resources.invalidate(conv["persist_dir"])
+                get_answer_cache().invalidate(conv["persist_dir"])
+                for job in ingest_worker.queue.jobs(conv["persist_dir"], active_only=True):
+                    ingest_worker.queue.cancel(job["id"])
+                # Only the references go; chunks other conversations still use stay in the shared store
+                ingest_worker.submit(
+                    "conversation_delete", conv["persist_dir"],
+                    {"conversation_id": conv["id"], "persist_dir": conv["persist_dir"]}
+                )
+                conversations.delete(selected, owner)
             st.session_state.current_conversation = None
             st.rerun()
 
@@ -112,35 +245,49 @@ with st.sidebar:
 if not st.session_state.current_conversation:
     st.stop()
 
-conv_data = st.session_state.conversations[st.session_state.current_conversation]
+conv_data = conversations.load(st.session_state.current_conversation, owner)
+if conv_data is None:
+    st.session_state.current_conversation = None
+    st.rerun()
+apply_finished_jobs(conv_data)
+uploaded_docs = conversations.documents(conv_data["id"])
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("📂 PDF Management")
 uploaded_files = st.sidebar.file_uploader("Upload PDFs", type="pdf", accept_multiple_files=True)
 
 if st.sidebar.button("➕ Add PDFs") and uploaded_files:
-    for pdf in uploaded_files:
-        reader = PdfReader(pdf)
-        text = "".join([p.extract_text() for p in reader.pages if p.extract_text()])
-        conv_data["uploaded_docs"].append((pdf.name, text))
-    st.sidebar.success("✅ PDFs added!")
-    build_vectorstore(conv_data)
+    queue_index_update(conv_data, files=uploaded_files)
+    st.sidebar.success("✅ PDFs queued. You can keep chatting while they are added.")
+
+render_jobs(ingest_worker.queue, conv_data["persist_dir"], st.sidebar)
 
 
-if conv_data["uploaded_docs"]:
+if uploaded_docs:
     st.sidebar.subheader("📜 Uploaded Documents")
-    for idx, (name, _) in enumerate(conv_data["uploaded_docs"]):
+    for idx, doc in enumerate(uploaded_docs):
         col1, col2 = st.sidebar.columns([4, 1])
-        col1.markdown(f"- {name}")
+        col1.markdown(f"- {doc['name']} ({doc['chunks']} chunks)")
         if col2.button("❌", key=f"del_{idx}"):
-            conv_data["uploaded_docs"].pop(idx)
-            build_vectorstore(conv_data)
+            conversations.remove_document(conv_data["id"], doc["name"])
+            # Queued behind any add job already in flight, so the index drops the chunks that job adds;
+            # apply_finished_jobs keeps that job from listing the document again
+            queue_index_update(conv_data, remove=[doc["name"]])
             st.rerun()
 
+if st.sidebar.checkbox("🐞 Show timing breakdown") and st.session_state.get("last_trace"):
+    metrics.render_debug_panel(st.session_state.last_trace)
 
 
 st.markdown("---")
-st.subheader(f"💬 Chat in: **{st.session_state.current_conversation}**")
+st.subheader(f"💬 Chat in: **{conv_data['name']}**")
+
+for user_text, ai_text in conversations.messages(conv_data["id"]):
+    st.markdown(f"**🧑‍💻 You:** {user_text}")
+    st.markdown(f"**🤖 AI:** {ai_text}")
+
+# The turn being answered streams here, where it will sit in the history after the rerun
+live_turn = st.container()
 
 user_input = st.text_input("Your message:", key="input_box", value="")
 
@@ -148,44 +295,49 @@ if st.button("Send"):
     if not user_input.strip():
         st.warning("⚠️ Please enter a message.")
     else:
-        conv_data["chat_history"].append(("You", user_input))
+        llm = get_llm()
+        answers = get_answer_cache()
+        memory = ConversationMemory(conv_data["memory"])
+        callbacks = [metrics.MetricsCallbackHandler()]
+        live_turn.markdown(f"**🧑‍💻 You:** {user_input}")
+        live_turn.markdown("**🤖 AI:**")
+
+        with metrics.trace("chat_turn") as turn_trace:
+            if uploaded_docs and os.path.exists(index_dir(conv_data)):
+                # RAG flow
+                try:
+                    rag = get_rag_resources(conv_data)
+                    history = memory.messages()
+                    cache_key = (conv_data["persist_dir"], conv_data["index_version"])
+                    # A question that doesn't lean on the history can be looked up before condensing
+                    cached = None
+                    if not history or is_self_contained(user_input):
+                        cached = answers.lookup(*cache_key, user_input)
+                    if cached is None:
+                        standalone, docs, _ = rag.prepare(user_input, history, callbacks=callbacks)
+                        if standalone != user_input:
+                            cached = answers.lookup(*cache_key, standalone)
+                    if cached:
+                        render_sources(cached.sources, live_turn)
+                        answer = cached.answer
+                        live_turn.markdown(answer)
+                    else:
+                        render_sources(docs, live_turn)
+                        answer = live_turn.write_stream(rag.stream(standalone, docs, callbacks=callbacks))
+                        answers.store(*cache_key, standalone, answer, docs)
+                except Exception as e:
+                    answer = f"⚠️ Retrieval error: {e}"
+            else:
+                try:
+                    messages = memory.messages(system_prompt="You are a helpful assistant.")
+                    messages.append(HumanMessage(content=user_input))
+                    answer = live_turn.write_stream(stream_llm(llm, messages, callbacks=callbacks))
+                except Exception as e:
+                    answer = f"⚠️ LLM error: {e}"
 
-        if conv_data["uploaded_docs"] and os.path.exists(conv_data["persist_dir"]):
-            # RAG flow
-            try:
-                retriever = Chroma(
-                    persist_directory=conv_data["persist_dir"],
-                    embedding_function=embedding
-                ).as_retriever()
-
-                qa_chain = ConversationalRetrievalChain.from_llm(
-                    llm,
-                    retriever,
-                    return_source_documents=False
-                )
-                result = qa_chain(
-                    {"question": user_input, "chat_history": conv_data["chat_history"]}
-                )
-                answer = result["answer"]
-            except Exception as e:
-                answer = f"⚠️ Retrieval error: {e}"
-        else:
-            
-            try:
-                messages = [{"role": "system", "content": "You are a helpful assistant."}]
-                for u, a in conv_data["chat_history"]:
-                    messages.append({"role": "user", "content": u})
-                    messages.append({"role": "assistant", "content": a})
-                messages.append({"role": "user", "content": user_input})
-                answer = llm.invoke(messages).content
-            except Exception as e:
-                answer = f"⚠️ LLM error: {e}"
-
-        conv_data["chat_history"].append(("AI", answer))
-        st.rerun()
+            memory.add_turn(user_input, answer, llm)
 
-for speaker, text in conv_data["chat_history"]:
-    if speaker == "You":
-        st.markdown(f"**🧑‍💻 You:** {text}")
-    elif speaker == "AI":
-        st.markdown(f"**🤖 AI:** {text}")
+        st.session_state.last_trace = turn_trace.summary()
+        conversations.update(conv_data["id"], memory=memory.state)
+        conversations.add_message(conv_data["id"], user_input, answer)
+        st.rerun()
@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+
+BATCH_SIZE = int(os.getenv("EMBED_REQUEST_BATCH_SIZE", "32"))
+MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+REQUESTS_PER_SECOND = float(os.getenv("EMBED_REQUESTS_PER_SECOND", "5"))
+MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def status_code(exc):
+    # Walk the cause chain: langchain_google_genai wraps the google-api error
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for attr in ("code", "status_code", "status"):
+            value = getattr(exc, attr, None)
+            if isinstance(value, int):
+                return value
+        response = getattr(exc, "response", None)
+        if isinstance(getattr(response, "status_code", None), int):
+            return response.status_code
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_retryable(exc):
+    return status_code(exc) in RETRYABLE_STATUS
+
+
+class TokenBucket:
+    """Thread-safe request pacing, shared by every caller whatever event loop it runs on."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how long to wait before using it.
+
+        Tokens can go negative: each caller queues behind the ones before it
+        instead of racing them for the next refill.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+
+class EmbeddingExecutor(Embeddings):
+    """Sends embedding requests in concurrent, rate limited batches.
+
+    Batches of batch_size texts are sent with at most max_concurrency requests
+    in flight, paced by a token bucket of requests_per_second. Both limits
+    belong to the executor, so they hold across calls, threads and event
+    loops, not just within one call. 429/5xx errors are retried with
+    full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        underlying,
+        batch_size=BATCH_SIZE,
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_second=REQUESTS_PER_SECOND,
+        max_retries=MAX_RETRIES,
+        base_delay=1.0,
+        max_delay=30.0,
+        progress=None,
+    ):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", None)
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.progress = progress
+
+        self.requests = 0
+        self.retries = 0
+        self.texts_embedded = 0
+        self._counter_lock = threading.Lock()
+        self._bucket = TokenBucket(requests_per_second) if requests_per_second and requests_per_second > 0 else None
+        # One pool for every call: its size is the concurrency cap. The default
+        # executor is sized by CPU count, which would silently cap it lower
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+
+    def _send(self, fn, payload):
+        # Paced on the worker thread, so a token is only spent when the request can go out
+        if self._bucket is not None:
+            self._bucket.acquire()
+        with self._counter_lock:
+            self.requests += 1
+        return fn(payload)
+
+    async def _call(self, fn, payload):
+        texts = len(payload) if isinstance(payload, list) else 1
+        with metrics.span("embed.batch", texts=texts) as batch_span:
+            attempt = 0
+            while True:
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(self._pool, self._send, fn, payload)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    with self._counter_lock:
+                        self.retries += 1
+                    metrics.count("embed.retries", status=str(status_code(e)))
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    attempt += 1
+                    batch_span.set(retries=attempt)
+                    await asyncio.sleep(delay)
+
+    async def aembed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        done = 0
+
+        async def run(batch):
+            nonlocal done
+            vectors = await self._call(self.underlying.embed_documents, batch)
+            done += len(batch)
+            with self._counter_lock:
+                self.texts_embedded += len(batch)
+            if self.progress:
+                self.progress(done, len(texts))
+            return vectors
+
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return [vector for vectors in results for vector in vectors]
+
+    async def aembed_query(self, text):
+        return await self._call(self.underlying.embed_query, text)
+
+    def embed_documents(self, texts):
+        return _run(self.aembed_documents(texts))
+
+    def embed_query(self, text):
+        return _run(self.aembed_query(text))
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "texts_embedded": self.texts_embedded,
+        }
+
+
+def _run(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # Called from inside an event loop (e.g. a sync API used by async code):
+    # run the coroutine on a helper thread instead of nesting loops
+    result = {}
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            result["value"] = context.run(asyncio.run, coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that looks vectors up in an on-disk cache first.
+
+    Entries are keyed by (model, sha256 of the text) so the same chunk is only
+    ever embedded once, whichever app or conversation ingests it. The least
+    recently used entries are evicted once the cache grows past max_entries.
+    """
+
+    def __init__(self, underlying, model=None, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.underlying = underlying
+        self.model = model or getattr(underlying, "model", type(underlying).__name__)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def _lookup(self, model, hashes):
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), LOOKUP_BATCH):
+                batch = unique[i:i + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, model, entries):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, array("f", vector).tobytes(), now) for h, vector in entries.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        found = self._lookup(self.model, hashes)
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found:
+                missing.setdefault(h, t)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        metrics.count("embedding_cache.hits", len(texts) - len(missing))
+        metrics.count("embedding_cache.misses", len(missing))
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), vectors))
+            self._store(self.model, new_entries)
+            found.update(new_entries)
+
+        return [found[h] for h in hashes]
+
+    def lookup(self, texts):
+        """Cached vectors for texts, None for those not in the cache. Never calls the model."""
+        hashes = [text_hash(t) for t in texts]
+        found = self._lookup(self.model, hashes)
+        return [found.get(h) for h in hashes]
+
+    def embed_query(self, text):
+        # Query embeddings use a different task type, so they get their own namespace
+        model = f"{self.model}#query"
+        h = text_hash(text)
+        found = self._lookup(model, [h])
+        if h in found:
+            self.hits += 1
+            metrics.count("embedding_cache.hits")
+            return found[h]
+
+        self.misses += 1
+        metrics.count("embedding_cache.misses")
+        vector = self.underlying.embed_query(text)
+        self._store(model, {h: vector})
+        return vector
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+
+def get_embeddings(model="models/embedding-001"):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from embed_executor import EmbeddingExecutor
+
+    # Cache outermost, so only misses reach the batched, rate limited executor
+    executor = EmbeddingExecutor(GoogleGenerativeAIEmbeddings(model=model))
+    return CachedEmbeddings(executor, model=model)
@@ -0,0 +1,246 @@
+"""FAISS index factory and recall/latency report.
+
+    python -m faiss_index report --index faiss_index --k 4
+    python -m faiss_index report --synthetic 50000 --dim 768
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+PQ_M = int(os.getenv("FAISS_PQ_M", "0"))
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+NPROBE = int(os.getenv("FAISS_NPROBE", "0"))
+EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "0"))
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+
+# Exact search is fine (and best) below this many vectors
+FLAT_LIMIT = 20000
+# Beyond this HNSW's graph memory outweighs its latency win; use IVF
+HNSW_LIMIT = 500000
+# faiss k-means wants ~39 training points per centroid
+POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+
+logger = logging.getLogger(__name__)
+
+
+def choose_index_type(n):
+    if n < FLAT_LIMIT:
+        return "flat"
+    if n < HNSW_LIMIT:
+        return "hnsw"
+    return "ivf"
+
+
+def factory_string(kind, n, pq_m=0):
+    if pq_m and n < PQ_CENTROIDS * POINTS_PER_CENTROID:
+        logger.warning("Only %d vectors, too few to train PQ%d; storing full vectors", n, pq_m)
+        pq_m = 0
+
+    if kind == "flat":
+        return f"PQ{pq_m}" if pq_m else "Flat"
+    if kind == "hnsw":
+        return f"HNSW{HNSW_M}_PQ{pq_m}" if pq_m else f"HNSW{HNSW_M}"
+    if kind == "ivf":
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // POINTS_PER_CENTROID))
+        return f"IVF{nlist},PQ{pq_m}" if pq_m else f"IVF{nlist},Flat"
+    raise ValueError(f"Unknown FAISS index type: {kind}")
+
+
+def new_index(dim, n, kind=None, pq_m=None):
+    import faiss
+
+    kind = kind or INDEX_TYPE
+    if kind == "auto":
+        kind = choose_index_type(n)
+    pq_m = PQ_M if pq_m is None else pq_m
+    return faiss.index_factory(dim, factory_string(kind, n, pq_m))
+
+
+def build_index(vectors, kind=None, pq_m=None, train_sample=TRAIN_SAMPLE, seed=0):
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    index = new_index(dim, n, kind=kind, pq_m=pq_m)
+    if not index.is_trained:
+        # Train on a random sample; training on every vector buys little and costs a lot
+        sample = vectors
+        if n > train_sample:
+            rows = np.random.default_rng(seed).choice(n, train_sample, replace=False)
+            sample = vectors[rows]
+        index.train(sample)
+    index.add(vectors)
+    return index
+
+
+def stream_index(batches, kind=None, pq_m=None, train_sample=TRAIN_SAMPLE):
+    """Build an index from batches of vectors without holding them all at once.
+
+    Only the first train_sample vectors are kept, to train on and to size the
+    index by; later batches go straight into index.add(). With kind="auto" a
+    stream longer than the sample is sized as if it had train_sample vectors.
+    """
+    kind = kind or INDEX_TYPE
+    pq_m = PQ_M if pq_m is None else pq_m
+    index = None
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        batch = np.ascontiguousarray(batch, dtype="float32")
+        if index is None and kind in ("flat", "hnsw") and not pq_m:
+            # Nothing to train or size, so there is no sample to collect
+            index = new_index(batch.shape[1], 0, kind=kind, pq_m=0)
+        if index is not None:
+            index.add(batch)
+            continue
+        pending.append(batch)
+        pending_rows += len(batch)
+        if pending_rows >= train_sample:
+            index = build_index(np.vstack(pending), kind=kind, pq_m=pq_m, train_sample=train_sample)
+            pending = []
+    if index is None and pending:
+        index = build_index(np.vstack(pending), kind=kind, pq_m=pq_m, train_sample=train_sample)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    import faiss
+
+    nprobe = NPROBE if nprobe is None else nprobe
+    ef_search = EF_SEARCH if ef_search is None else ef_search
+
+    if nprobe:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search:
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = ef_search
+    return index
+
+
+def build_store(texts, vectors, embedding, metadatas=None, kind=None, pq_m=None):
+    return wrap_index(build_index(vectors, kind=kind, pq_m=pq_m), texts, embedding, metadatas)
+
+
+def wrap_index(index, texts, embedding, metadatas=None):
+    """LangChain FAISS store over index, whose rows are texts in order."""
+    import uuid
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    ids = [str(uuid.uuid4()) for _ in texts]
+    metadatas = metadatas or [{} for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(
+        embedding_function=embedding,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+
+
+def _search(index, queries, k):
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    return found, elapsed / len(queries) * 1000
+
+
+def recall_report(vectors, queries, k=4, kinds=("hnsw", "ivf"), pq_values=(0,), nprobes=(1, 4, 16, 64), ef_searches=(16, 32, 64, 128)):
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    truth, exact_ms = _search(exact, queries, k)
+
+    rows = [{"index": "Flat", "param": None, "recall": 1.0, "ms_per_query": round(exact_ms, 4)}]
+    for kind in kinds:
+        for pq_m in pq_values:
+            start = time.perf_counter()
+            index = build_index(vectors, kind=kind, pq_m=pq_m)
+            build_seconds = time.perf_counter() - start
+            name = factory_string(kind, len(vectors), pq_m)
+
+            params = [("nprobe", p) for p in nprobes] if kind == "ivf" else [("efSearch", e) for e in ef_searches] if kind == "hnsw" else [(None, None)]
+            for param, value in params:
+                set_search_params(
+                    index,
+                    nprobe=value if param == "nprobe" else 0,
+                    ef_search=value if param == "efSearch" else 0,
+                )
+                found, ms = _search(index, queries, k)
+                hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+                rows.append({
+                    "index": name,
+                    "param": f"{param}={value}" if param else None,
+                    "recall": round(hits / truth.size, 4),
+                    "ms_per_query": round(ms, 4),
+                    "build_seconds": round(build_seconds, 3),
+                })
+    return rows
+
+
+def _load_vectors(index_dir):
+    from embedding_cache import get_embeddings
+    from langchain_community.vectorstores import FAISS
+
+    embedding = get_embeddings("models/embedding-001")
+    store = FAISS.load_local(index_dir, embedding, allow_dangerous_deserialization=True)
+    texts = [store.docstore.search(doc_id).page_content for doc_id in store.index_to_docstore_id.values()]
+    # Chunk vectors come back from the embedding cache, not the API
+    return np.array(embedding.embed_documents(texts), dtype="float32")
+
+
+def _synthetic_vectors(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 100), dim))
+    return (centers[rng.integers(len(centers), size=n)] + rng.normal(scale=0.3, size=(n, dim))).astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="recall vs latency of approximate indexes against exact search")
+    report.add_argument("--index", help="saved FAISS index directory to take vectors from")
+    report.add_argument("--synthetic", type=int, help="use N synthetic clustered vectors instead")
+    report.add_argument("--dim", type=int, default=768)
+    report.add_argument("--queries", type=int, default=200)
+    report.add_argument("--k", type=int, default=4)
+    report.add_argument("--pq", type=int, nargs="*", default=[0])
+    report.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.index:
+        vectors = _load_vectors(args.index)
+    else:
+        vectors = _synthetic_vectors(args.synthetic or 50000, args.dim)
+
+    rng = np.random.default_rng(1)
+    rows_for_queries = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[rows_for_queries] + rng.normal(scale=0.05, size=(len(rows_for_queries), vectors.shape[1]))
+
+    rows = recall_report(vectors, queries, k=args.k, pq_values=args.pq)
+    for row in rows:
+        print(json.dumps(row))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import metrics
+
+KEYWORD_INDEX_FILE = "keyword_index.json"
+FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+RRF_K = 60
+
+# Keeps part numbers, error codes and versions such as "pn-001-0042" or "v1.2" whole
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or so that the "
+    "this to was what when where which who why will with".split()
+)
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # Also index the parts of compound tokens, so "PN 0042" still matches "PN-001-0042"
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", token) if part not in STOPWORDS)
+    return tokens
+
+
+def exact_terms(text):
+    """Whole tokens with a digit in them: part numbers, error codes, versions."""
+    return {token for token in TOKEN_RE.findall(text.lower()) if any(c.isdigit() for c in token)}
+
+
+def keyword_index_path(index_dir):
+    return os.path.join(index_dir, KEYWORD_INDEX_FILE)
+
+
+class KeywordIndex:
+    """In-memory BM25 inverted index over chunk Documents.
+
+    Chunks are added and removed by id, so it can follow the vector store
+    incrementally; save()/load() keep it next to the vector index on disk.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.lengths = {}
+        self.postings = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _add(self, doc_id, doc):
+        if doc_id in self.docs:
+            self._remove(doc_id)
+        counts = Counter(tokenize(doc.page_content))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.docs[doc_id] = doc
+        self.lengths[doc_id] = sum(counts.values())
+        self.total_length += self.lengths[doc_id]
+
+    def _remove(self, doc_id):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in set(tokenize(doc.page_content)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def add(self, docs, ids):
+        with self._lock:
+            for doc_id, doc in zip(ids, docs):
+                self._add(doc_id, doc)
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def remove_source(self, source):
+        with self._lock:
+            for doc_id in [i for i, doc in self.docs.items() if doc.metadata.get("source") == source]:
+                self._remove(doc_id)
+
+    def search(self, query, k=4):
+        with self._lock:
+            if not self.docs:
+                return []
+            n = len(self.docs)
+            avg_length = self.total_length / n or 1
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self.docs[doc_id], score) for doc_id, score in best]
+
+    def save(self, path):
+        with self._lock:
+            records = [
+                {"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}
+                for doc_id, doc in self.docs.items()
+            ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                records = json.load(f)
+            index.add(
+                (Document(page_content=r["text"], metadata=r["metadata"]) for r in records),
+                [r["id"] for r in records],
+            )
+        return index
+
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    scores = {}
+    docs = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def promote_exact_matches(fused, keyword_docs, query):
+    """Moves keyword hits containing every exact term of the query to the front.
+
+    Plain RRF lets a chunk that is the only one holding a part number, but
+    ranks nowhere in the dense list, lose to any chunk ranked moderately in
+    both lists. Those hits are what such a query asks for.
+    """
+    terms = exact_terms(query)
+    if not terms:
+        return fused
+    exact = {doc.page_content for doc in keyword_docs if terms <= set(tokenize(doc.page_content))}
+    return [doc for doc in fused if doc.page_content in exact] + [doc for doc in fused if doc.page_content not in exact]
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses a dense retriever with BM25 keyword search by reciprocal rank.
+
+    Both sides fetch fetch_k candidates; only the top k fused chunks are
+    returned. Chunks holding every part number or code in the question come
+    first, so exact terms are found without raising k.
+    """
+
+    dense: BaseRetriever
+    keyword_index: Any
+    k: int = 4
+    fetch_k: int = FETCH_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense_docs = self.dense.invoke(query, config={"callbacks": run_manager.get_child()})
+        with metrics.span("retrieve.keyword") as current:
+            keyword_docs = [doc for doc, _ in self.keyword_index.search(query, self.fetch_k)]
+            current.set(chunks=len(keyword_docs))
+        fused = reciprocal_rank_fusion([dense_docs, keyword_docs])
+        return promote_exact_matches(fused, keyword_docs, query)[:self.k]
+
+
+def hybrid_retriever(vectorstore, keyword_index, k=4, fetch_k=FETCH_K, search_type="similarity"):
+    search_kwargs = {"k": fetch_k}
+    if search_type == "mmr":
+        search_kwargs["fetch_k"] = fetch_k * 2
+    dense = vectorstore.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+    return HybridRetriever(dense=dense, keyword_index=keyword_index, k=k, fetch_k=fetch_k)
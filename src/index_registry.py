@@ -0,0 +1,267 @@
+"""Registry of the index directories the apps create, and a collector for the rest.
+
+Apps register every index base they use; leased ones (day9's per-session
+stores) are touched while in use and expire once nothing touches them.
+sweep() reclaims, in order:
+
+- registered bases whose lease ran out,
+- version directories superseded by a later swap,
+- directories matching ORPHAN_PATTERNS that nobody registered.
+
+Anything modified within the grace period is left alone. Directories are
+moved into TRASH_DIR before being deleted, so a store another process still
+has open is never half-deleted in place. A move refused because of a lock
+(Windows) is retried on the next sweep.
+
+    cd src && python index_registry.py report
+    cd src && python index_registry.py sweep --dry-run
+    cd src && python index_registry.py compact
+"""
+import argparse
+import fnmatch
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from ingest_jobs import KEEP_VERSIONS, current_index_dir, index_versions
+
+REGISTRY_PATH = os.getenv("INDEX_REGISTRY_PATH", "index_registry.sqlite3")
+TRASH_DIR = os.getenv("INDEX_TRASH_DIR", ".index_trash")
+# Unregistered or unpublished directories younger than this may belong to a process still writing them
+GRACE_SECONDS = 3600
+ORPHAN_PATTERNS = ("chroma_db_*", "conversation_index_*")
+# Leased bases are touched at most this often
+TOUCH_INTERVAL = 60
+
+
+def scan(path):
+    """(bytes, latest mtime) of everything under path."""
+    try:
+        total, latest = 0, os.path.getmtime(path)
+    except OSError:
+        return 0, 0.0
+    if os.path.isfile(path):
+        return os.path.getsize(path), latest
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += stat.st_size
+            latest = max(latest, stat.st_mtime)
+    return total, latest
+
+
+def _base_of(name):
+    # chroma_db_ab12cd.v1729...-1f2e3d4c and chroma_db_ab12cd.current both belong to chroma_db_ab12cd
+    return name.split(".", 1)[0]
+
+
+class IndexRegistry:
+    def __init__(self, path=REGISTRY_PATH, trash_dir=TRASH_DIR):
+        self.trash_dir = trash_dir
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS indexes (
+                base TEXT PRIMARY KEY,
+                app TEXT NOT NULL,
+                lease REAL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def _execute(self, query, params=()):
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor
+
+    def register(self, base, app, lease=None):
+        """Track base; with a lease (seconds) it is reclaimed once untouched for that long."""
+        base = os.path.abspath(base)
+        now = time.time()
+        if now - self._touched.get(base, 0.0) < TOUCH_INTERVAL:
+            return
+        self._execute(
+            """INSERT INTO indexes (base, app, lease, created, last_used) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (base) DO UPDATE SET last_used = excluded.last_used""",
+            (base, app, lease, now, now),
+        )
+        self._touched[base] = now
+
+    def forget(self, base):
+        base = os.path.abspath(base)
+        self._touched.pop(base, None)
+        self._execute("DELETE FROM indexes WHERE base = ?", (base,))
+
+    def indexes(self):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM indexes ORDER BY app, created")]
+
+    def _discard(self, path, dry_run):
+        size, _ = scan(path)
+        if dry_run:
+            return size
+        os.makedirs(self.trash_dir, exist_ok=True)
+        try:
+            os.replace(path, os.path.join(self.trash_dir, f"{os.path.basename(path)}-{uuid.uuid4().hex[:8]}"))
+        except FileNotFoundError:
+            return 0
+        except OSError:
+            # Still open somewhere that forbids moving it (Windows); try again next sweep
+            return None
+        return size
+
+    def _empty_trash(self, dry_run):
+        if dry_run or not os.path.isdir(self.trash_dir):
+            return
+        for name in os.listdir(self.trash_dir):
+            path = os.path.join(self.trash_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _stale_versions(self, base, now, grace):
+        current = current_index_dir(base)
+        versions = index_versions(base)
+        if current not in versions:
+            return []
+        older = versions[:versions.index(current)]
+        stale = older[:max(0, len(older) - KEEP_VERSIONS)]
+        # Versions newer than the published one are builds in progress unless they were abandoned
+        stale += [path for path in versions[versions.index(current) + 1:] if scan(path)[1] < now - grace]
+        return stale
+
+    def sweep(self, root=".", grace=GRACE_SECONDS, dry_run=False):
+        """Reclaim unused index directories; returns (path, bytes, reason) for each."""
+        now = time.time()
+        reclaimed = []
+        self._empty_trash(dry_run)
+
+        def discard(path, reason):
+            size = self._discard(path, dry_run)
+            reclaimed.append((path, size, reason if size is not None else f"{reason} (locked, retrying next sweep)"))
+
+        registered = set()
+        for entry in self.indexes():
+            base = entry["base"]
+            registered.add(base)
+            if entry["lease"] is not None and entry["last_used"] < now - entry["lease"]:
+                paths = [path for path in [*index_versions(base), base, f"{base}.current"] if os.path.exists(path)]
+                if paths and max(scan(path)[1] for path in paths) >= now - grace:
+                    continue
+                for path in paths:
+                    discard(path, "lease expired")
+                if not dry_run:
+                    self._execute("DELETE FROM indexes WHERE base = ? AND last_used = ?", (base, entry["last_used"]))
+                continue
+            for path in self._stale_versions(base, now, grace):
+                discard(path, "superseded version")
+
+        orphans = {}
+        for name in os.listdir(root):
+            if any(fnmatch.fnmatch(name, pattern) for pattern in ORPHAN_PATTERNS):
+                base = os.path.abspath(os.path.join(root, _base_of(name)))
+                if base not in registered:
+                    orphans.setdefault(base, []).append(os.path.join(root, name))
+        for base, paths in orphans.items():
+            if max(scan(path)[1] for path in paths) < now - grace:
+                for path in paths:
+                    discard(path, "unregistered")
+
+        self._empty_trash(dry_run)
+        metrics.count("index_registry.bytes_reclaimed", sum(size or 0 for _, size, _ in reclaimed))
+        return reclaimed
+
+    def compact(self, dry_run=False):
+        """VACUUM the SQLite file of every registered Chroma store; returns (path, before, after)."""
+        results = []
+        for entry in self.indexes():
+            path = os.path.join(current_index_dir(entry["base"]), "chroma.sqlite3")
+            if not os.path.exists(path):
+                continue
+            before = os.path.getsize(path)
+            if not dry_run:
+                try:
+                    # timeout=0: a store busy with a write is skipped rather than waited on
+                    conn = sqlite3.connect(path, timeout=0, isolation_level=None)
+                    try:
+                        conn.execute("VACUUM")
+                    finally:
+                        conn.close()
+                except sqlite3.OperationalError:
+                    results.append((path, before, None))
+                    continue
+            results.append((path, before, os.path.getsize(path)))
+        return results
+
+    def usage(self, root="."):
+        """Disk usage per registered base (all versions included), orphan and the trash."""
+        now = time.time()
+        rows = []
+        seen = set()
+        for entry in self.indexes():
+            base = entry["base"]
+            paths = [path for path in [base, *index_versions(base)] if os.path.exists(path)]
+            seen.update(paths)
+            expires = None if entry["lease"] is None else entry["last_used"] + entry["lease"] - now
+            rows.append({
+                "path": base, "app": entry["app"], "versions": len(index_versions(base)),
+                "bytes": sum(scan(path)[0] for path in paths), "expires_in": expires,
+            })
+        for name in sorted(os.listdir(root)):
+            path = os.path.abspath(os.path.join(root, name))
+            if path not in seen and os.path.isdir(path) and any(fnmatch.fnmatch(name, p) for p in ORPHAN_PATTERNS):
+                rows.append({"path": path, "app": "unregistered", "versions": 0, "bytes": scan(path)[0], "expires_in": None})
+        if os.path.isdir(self.trash_dir):
+            rows.append({"path": os.path.abspath(self.trash_dir), "app": "trash", "versions": 0,
+                         "bytes": scan(self.trash_dir)[0], "expires_in": None})
+        return rows
+
+
+def _megabytes(size):
+    return "locked" if size is None else f"{size / 2**20:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["report", "sweep", "compact"])
+    parser.add_argument("--root", default=".", help="directory the apps run in")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    registry = IndexRegistry(os.path.join(args.root, REGISTRY_PATH), os.path.join(args.root, TRASH_DIR))
+    if args.command == "report":
+        rows = registry.usage(args.root)
+        for row in rows:
+            lease = "" if row["expires_in"] is None else f"  lease {max(0, row['expires_in']) / 3600:.1f}h"
+            print(f"{_megabytes(row['bytes']):>10}  {row['app']:<12} {row['path']} ({row['versions']} versions){lease}")
+        print(f"{_megabytes(sum(row['bytes'] for row in rows)):>10}  total")
+    elif args.command == "sweep":
+        reclaimed = registry.sweep(args.root, args.grace, args.dry_run)
+        for path, size, reason in reclaimed:
+            print(f"{_megabytes(size):>10}  {reason}: {path}")
+        print(f"{_megabytes(sum(size or 0 for _, size, _ in reclaimed)):>10}  {'reclaimable' if args.dry_run else 'reclaimed'}")
+    else:
+        for path, before, after in registry.compact(args.dry_run):
+            print(f"{_megabytes(before):>10} -> {'busy, skipped' if after is None else _megabytes(after)}  {path}")
+
+
+if __name__ == "__main__":
+    main()
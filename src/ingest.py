@@ -0,0 +1,119 @@
+import hashlib
+import os
+import time
+from itertools import groupby
+
+from langchain_core.documents import Document
+
+import metrics
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# How many chunks' worth of text may pile up before the splitter is run
+BUFFER_CHUNKS = 4
+
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_chunks(records, splitter):
+    """Turn (source, page_no, text) records into chunk Documents as they arrive.
+
+    Only a few chunks' worth of text is buffered per file. The last chunk of
+    every split is carried over, so chunks still span page boundaries the way
+    they did when the whole file was split at once. Pages are joined with a
+    newline, so the words either side of a page break stay apart.
+    """
+    limit = getattr(splitter, "_chunk_size", 1000) * BUFFER_CHUNKS
+
+    for source, pages in groupby(records, key=lambda record: record[0]):
+        index = 0
+        buffer = ""
+        split_seconds = 0.0
+        for _, _, text in pages:
+            buffer = f"{buffer}\n{text}" if buffer else text
+            if len(buffer) < limit:
+                continue
+            start = time.perf_counter()
+            chunks = splitter.split_text(buffer)
+            split_seconds += time.perf_counter() - start
+            for chunk in chunks[:-1]:
+                yield Document(page_content=chunk, metadata={"source": source, "chunk": index})
+                index += 1
+            buffer = chunks[-1] if chunks else ""
+
+        start = time.perf_counter()
+        chunks = splitter.split_text(buffer)
+        split_seconds += time.perf_counter() - start
+        for chunk in chunks:
+            yield Document(page_content=chunk, metadata={"source": source, "chunk": index})
+            index += 1
+        metrics.record("split", split_seconds, source=source, chunks=index)
+
+
+def chunk_id(doc):
+    return f"{doc.metadata['source']}:{doc.metadata['chunk']}"
+
+
+def content_id(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sync_documents(vectorstore, documents):
+    """Make a Chroma store hold exactly documents, embedding only the ones it doesn't have yet."""
+    wanted = {content_id(doc.page_content): doc for doc in documents}
+    existing = set(vectorstore.get(include=[])["ids"])
+    stale = existing - set(wanted)
+    if stale:
+        vectorstore.delete(ids=list(stale))
+    fresh = {doc_id: doc for doc_id, doc in wanted.items() if doc_id not in existing}
+    if fresh:
+        with metrics.span("index.write", chunks=len(fresh), chars=sum(len(doc.page_content) for doc in fresh.values())):
+            vectorstore.add_documents(list(fresh.values()), ids=list(fresh))
+    return len(fresh)
+
+
+def ingest_documents(vectorstore, documents, batch_size=EMBED_BATCH_SIZE, with_ids=False, progress=None, keyword_index=None):
+    count = 0
+    for batch in iter_batches(documents, batch_size):
+        ids = [chunk_id(doc) for doc in batch] if with_ids else None
+        with metrics.span("index.write", chunks=len(batch), chars=sum(len(doc.page_content) for doc in batch)):
+            vectorstore.add_documents(batch, ids=ids)
+        if keyword_index is not None:
+            keyword_index.add(batch, ids or [chunk_id(doc) for doc in batch])
+        count += len(batch)
+        if progress:
+            progress(count)
+    return count
+
+
+def ingest_faiss(texts, embedding, batch_size=EMBED_BATCH_SIZE, progress=None, index_type=None, keyword_index=None):
+    from faiss_index import stream_index, wrap_index
+
+    all_texts = []
+
+    def vector_batches():
+        for batch in iter_batches(texts, batch_size):
+            vectors = embedding.embed_documents(batch)
+            if keyword_index is not None:
+                ids = [str(i) for i in range(len(all_texts), len(all_texts) + len(batch))]
+                keyword_index.add([Document(page_content=text) for text in batch], ids)
+            all_texts.extend(batch)
+            if progress:
+                progress(len(all_texts))
+            yield vectors
+
+    # Vectors are added batch by batch; only trained index types hold back a sample to train on
+    with metrics.span("index.build") as build_span:
+        index = stream_index(vector_batches(), kind=index_type)
+        if index is None:
+            return None
+        build_span.set(chunks=len(all_texts), index=type(index).__name__)
+    return wrap_index(index, all_texts, embedding)
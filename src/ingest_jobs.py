@@ -0,0 +1,378 @@
+"""Background ingestion: a SQLite-backed job queue, a worker thread and index swapping.
+
+Uploaded files are spooled to disk when a job is submitted, so a job survives
+the browser session that created it and is picked up again if the server
+restarts. Jobs build a new index directory next to the live one and publish it
+by rewriting a small pointer file, so readers keep using the previous version
+until the new one is complete.
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import metrics
+from pdf_pipeline import read_bytes, source_name
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_jobs.sqlite3")
+SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", ".ingest_spool")
+# Previous index versions kept after a swap, for readers that still have one open
+KEEP_VERSIONS = 1
+# Running jobs touch their row this often; ones silent for 3 beats belong to a dead worker
+HEARTBEAT_SECONDS = 10
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH, spool_dir=SPOOL_DIR):
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+        self._conn.commit()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def spool(self, job_id, files):
+        """Copy uploaded files to disk so the job doesn't depend on the browser session.
+
+        Each file gets a numbered directory of its own, so uploads sharing a
+        name don't overwrite each other. The file keeps the base of its
+        uploaded name, which is what jobs show and index it under.
+        """
+        paths = []
+        for i, upload in enumerate(files):
+            # The name comes from the browser: no directories, and nothing that resolves to one
+            name = os.path.basename(source_name(upload).replace("\\", "/"))
+            if name in ("", ".", ".."):
+                name = "document.pdf"
+            directory = os.path.join(self.spool_dir, job_id, f"{i:04d}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, name)
+            with open(path, "wb") as f:
+                f.write(read_bytes(upload))
+            paths.append(path)
+        return paths
+
+    def submit(self, kind, target, payload=None, files=()):
+        job_id = uuid.uuid4().hex
+        payload = dict(payload or {})
+        if files:
+            payload["files"] = self.spool(job_id, files)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, target, payload, status, created, updated) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, target, json.dumps(payload), now, now),
+            )
+            self._conn.commit()
+        metrics.count("ingest_jobs.submitted", kind=kind)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def jobs(self, target=None, active_only=False, limit=20):
+        query = "SELECT * FROM jobs WHERE 1 = 1"
+        params = []
+        if target is not None:
+            query += " AND target = ?"
+            params.append(target)
+        if active_only:
+            query += " AND status IN ('queued', 'running')"
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._row(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def claim(self, kinds):
+        if not kinds:
+            return None
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status = 'queued' AND kind IN ({placeholders}) ORDER BY created LIMIT 1",
+                list(kinds),
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (f"{os.getpid()}:{threading.get_ident()}", time.time(), row["id"]),
+            ).rowcount
+            self._conn.commit()
+        return self.get(row["id"]) if claimed else None
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            self._conn.commit()
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            self._conn.commit()
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_orphans(self, kinds, stale_after=3 * HEARTBEAT_SECONDS):
+        # Jobs whose worker stopped heartbeating (server restarted or crashed) start over
+        if not kinds:
+            return 0
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            count = self._conn.execute(
+                f"""UPDATE jobs SET status = 'queued', worker = NULL, done = 0, message = '', updated = ?
+                WHERE status = 'running' AND updated < ? AND kind IN ({placeholders})""",
+                [time.time(), time.time() - stale_after, *kinds],
+            ).rowcount
+            self._conn.commit()
+        return count
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting and cancellation checks."""
+
+    def __init__(self, queue, job, check_interval=0.5):
+        self.queue = queue
+        self.job = job
+        self.check_interval = check_interval
+        self._checked = 0.0
+
+    @property
+    def id(self):
+        return self.job["id"]
+
+    def check(self):
+        if time.time() - self._checked < self.check_interval:
+            return
+        self._checked = time.time()
+        if self.queue.cancel_requested(self.id):
+            raise JobCancelled(self.id)
+
+    def progress(self, done, message=""):
+        self.queue.update(self.id, done=done, message=message)
+        self.check()
+
+
+class IngestWorker:
+    """Runs queued jobs one at a time on a daemon thread.
+
+    One job at a time means jobs for the same index never write concurrently;
+    embedding itself is still parallel inside EmbeddingExecutor.
+    """
+
+    def __init__(self, queue, poll_interval=0.5):
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._thread = None
+        self._wake = threading.Event()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+        self._wake.set()
+        return handler
+
+    def submit(self, kind, target, payload=None, files=()):
+        job_id = self.queue.submit(kind, target, payload, files)
+        self._wake.set()
+        return job_id
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="ingest-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        last_requeue = 0.0
+        while True:
+            kinds = list(self.handlers)
+            if time.time() - last_requeue > HEARTBEAT_SECONDS:
+                self.queue.requeue_orphans(kinds)
+                last_requeue = time.time()
+            job = self.queue.claim(kinds)
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.run(job)
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            self.queue.update(job_id)
+
+    def run(self, job):
+        context = JobContext(self.queue, job)
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job["id"], stop), daemon=True).start()
+        try:
+            with metrics.span("ingest_job", kind=job["kind"]):
+                result = self.handlers[job["kind"]](job["payload"], context)
+            self.queue.update(job["id"], status="done", result=result)
+        except JobCancelled:
+            self.queue.update(job["id"], status="cancelled", message="Cancelled")
+        except Exception as e:
+            logger.exception("ingest job %s failed", job["id"])
+            self.queue.update(job["id"], status="failed", error=str(e))
+        finally:
+            stop.set()
+            shutil.rmtree(os.path.join(self.queue.spool_dir, job["id"]), ignore_errors=True)
+
+
+def _pointer_path(base):
+    return f"{base}.current"
+
+
+def current_index_dir(base):
+    """The published version of the index at base (base itself before the first swap)."""
+    try:
+        with open(_pointer_path(base), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return base
+    return os.path.join(os.path.dirname(base), name)
+
+
+def index_version(base):
+    """Identifies what is published at base, and changes with every publish.
+
+    One stat and one small read however large the index, so it is cheap
+    enough to check on every question. None before the first publish.
+    """
+    pointer = _pointer_path(base)
+    try:
+        stat = os.stat(pointer)
+    except FileNotFoundError:
+        return None
+    # The pointer is replaced, never rewritten in place, so a publish always changes its inode or mtime
+    return f"{current_index_dir(base)}:{stat.st_ino}:{stat.st_mtime_ns}"
+
+
+def index_versions(base):
+    parent = os.path.dirname(base) or "."
+    prefix = os.path.basename(base) + ".v"
+    if not os.path.isdir(parent):
+        return []
+    return sorted(os.path.join(os.path.dirname(base), name) for name in os.listdir(parent) if name.startswith(prefix))
+
+
+def new_index_dir(base, job_id, copy_current=False):
+    """A fresh directory for the next version, optionally seeded with the current one."""
+    path = f"{base}.v{time.time_ns()}-{job_id[:8]}"
+    current = current_index_dir(base)
+    if copy_current and os.path.isdir(current):
+        shutil.copytree(current, path)
+    else:
+        os.makedirs(path)
+    return path
+
+
+def publish_index_dir(base, path, keep=KEEP_VERSIONS):
+    pointer = _pointer_path(base)
+    tmp_pointer = f"{pointer}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(path))
+    os.replace(tmp_pointer, pointer)
+
+    # Drop versions older than the last `keep` superseded ones
+    old = [version for version in index_versions(base) if version != path]
+    for version in old[:max(0, len(old) - keep)]:
+        shutil.rmtree(version, ignore_errors=True)
+
+
+@contextmanager
+def building_index(base, job_id, copy_current=False):
+    """Yields a new version directory, published if the block completes and removed if not."""
+    path = new_index_dir(base, job_id, copy_current)
+    try:
+        yield path
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    publish_index_dir(base, path)
+
+
+def remove_index(base):
+    for version in index_versions(base):
+        shutil.rmtree(version, ignore_errors=True)
+    if os.path.exists(_pointer_path(base)):
+        os.remove(_pointer_path(base))
+    if os.path.isdir(base):
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def render_jobs(queue, target, container=None, refresh_seconds=1.0):
+    """Shows live progress for target's active jobs; reruns the app once they finish."""
+    import streamlit as st
+
+    if not queue.jobs(target, active_only=True, limit=1):
+        latest = queue.jobs(target, limit=1)
+        if latest and latest[0]["status"] == "failed":
+            (container or st).error(f"❌ Processing failed: {latest[0]['error']}")
+        return
+
+    @st.fragment(run_every=refresh_seconds)
+    def panel():
+        active = queue.jobs(target, active_only=True)
+        if not active:
+            st.rerun(scope="app")
+        for job in active:
+            names = ", ".join(os.path.basename(path) for path in job["payload"].get("files", []))
+            if job["status"] == "queued":
+                st.caption(f"🕒 Queued: {names}")
+            else:
+                st.caption(f"⏳ {job['message'] or 'Starting'}: {names}")
+            if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                queue.cancel(job["id"])
+
+    with container or st.container():
+        panel()
@@ -0,0 +1,303 @@
+"""Lightweight spans and counters for the RAG pipeline.
+
+Sinks are picked with METRICS_SINKS, a comma separated list of
+``log``, ``jsonl:<path>`` and ``prometheus:<path>``. With no sinks configured
+spans are still collected into the active trace (see trace()), which is what
+the Streamlit debug panel shows.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("rag.metrics")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "start": self.start,
+            "ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            **self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.counters = {}
+        self.start = time.time()
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "ms": round((self.duration or 0) * 1000, 3),
+            "spans": [span.to_dict() for span in self.spans],
+            "counters": dict(self.counters),
+        }
+
+
+class LogSink:
+    def span(self, span):
+        logger.info("span %s %.1fms %s", span.name, span.duration * 1000, span.attrs)
+
+    def count(self, name, value, labels):
+        logger.info("count %s +%s %s", name, value, labels)
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    def span(self, span):
+        self._write({"type": "span", **span.to_dict()})
+
+    def count(self, name, value, labels):
+        self._write({"type": "counter", "name": name, "value": value, "time": time.time(), **labels})
+
+
+class PrometheusSink:
+    """Aggregates spans and counters and rewrites a text-format export file."""
+
+    def __init__(self, path=None, min_interval=1.0):
+        self.path = path
+        self.min_interval = min_interval
+        self.counters = {}
+        self.span_seconds = {}
+        self._written = 0.0
+        self._lock = threading.Lock()
+        if path:
+            # Writes are rate limited, so whatever came after the last one is written at exit
+            atexit.register(self.flush)
+
+    def span(self, span):
+        with self._lock:
+            total, count = self.span_seconds.get(span.name, (0.0, 0))
+            self.span_seconds[span.name] = (total + span.duration, count + 1)
+        self._maybe_write()
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._maybe_write()
+
+    def render(self):
+        with self._lock:
+            return self._render()
+
+    def _render(self):
+        lines = ["# TYPE rag_span_seconds summary"]
+        for name, (total, count) in sorted(self.span_seconds.items()):
+            lines.append(f'rag_span_seconds_sum{{span="{_escape_label(name)}"}} {total:.6f}')
+            lines.append(f'rag_span_seconds_count{{span="{_escape_label(name)}"}} {count}')
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = "rag_" + name.replace(".", "_") + "_total"
+            label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _maybe_write(self):
+        with self._lock:
+            if self.path and time.time() - self._written >= self.min_interval:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self.path:
+                self._write()
+
+    def _write(self):
+        # Callers hold the lock, so two threads never share the tmp file
+        self._written = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self._render())
+        os.replace(tmp_path, self.path)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def sinks_from_env(value=None):
+    value = os.getenv("METRICS_SINKS", "") if value is None else value
+    sinks = []
+    for spec in filter(None, (part.strip() for part in value.split(","))):
+        kind, _, arg = spec.partition(":")
+        if kind == "log":
+            sinks.append(LogSink())
+        elif kind == "jsonl":
+            sinks.append(JsonlSink(arg or "metrics.jsonl"))
+        elif kind == "prometheus":
+            sinks.append(PrometheusSink(arg or "metrics.prom"))
+        else:
+            raise ValueError(f"Unknown metrics sink: {spec}")
+    return sinks
+
+
+SINKS = sinks_from_env()
+
+
+def add_sink(sink):
+    SINKS.append(sink)
+    return sink
+
+
+def _emit_span(span):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(span)
+    for sink in SINKS:
+        try:
+            sink.span(span)
+        except Exception:
+            logger.exception("metrics sink failed")
+
+
+@contextmanager
+def span(name, **attrs):
+    parent = _current_span.get()
+    current = Span(name, parent=parent.name if parent else None, **attrs)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _emit_span(current)
+
+
+def record(name, duration, **attrs):
+    # For work that can't sit inside one with-block, e.g. time spent inside a generator
+    parent = _current_span.get()
+    current = Span(name, parent=parent.name if parent else None, **attrs)
+    current.start = time.time() - duration
+    current.duration = duration
+    _emit_span(current)
+
+
+def count(name, value=1, **labels):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, value)
+    for sink in SINKS:
+        try:
+            sink.count(name, value, labels)
+        except Exception:
+            logger.exception("metrics sink failed")
+
+
+@contextmanager
+def trace(name):
+    current = Trace(name)
+    token = _current_trace.set(current)
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield current
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_trace.reset(token)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times LLM and retriever calls made inside LangChain chains."""
+
+    def __init__(self):
+        self._open = {}
+
+    def _start(self, run_id, name, **attrs):
+        parent = _current_span.get()
+        self._open[run_id] = (Span(name, parent=parent.name if parent else None, **attrs), time.perf_counter())
+
+    def _end(self, run_id, **attrs):
+        entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        current, start = entry
+        current.duration = time.perf_counter() - start
+        current.set(**attrs)
+        _emit_span(current)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, "llm", prompt_chars=chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", prompt_chars=sum(len(p) for p in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        attrs = {}
+        for generation in (response.generations[0] if response.generations else []):
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                attrs["input_tokens"] = usage.get("input_tokens")
+                attrs["output_tokens"] = usage.get("output_tokens")
+                count("llm.input_tokens", usage.get("input_tokens") or 0)
+                count("llm.output_tokens", usage.get("output_tokens") or 0)
+        self._end(run_id, **attrs)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieve", query_chars=len(query))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, chunks=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+
+def render_debug_panel(summary, container=None):
+    import streamlit as st
+
+    container = container or st.sidebar
+    with container.expander(f"🐞 Last turn: {summary['ms']:.0f} ms", expanded=False):
+        rows = [
+            {k: v for k, v in span.items() if k not in ("start",)}
+            for span in summary["spans"]
+        ]
+        st.dataframe(rows, use_container_width=True)
+        if summary["counters"]:
+            st.json(summary["counters"])
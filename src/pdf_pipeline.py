@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", ".pdf_page_cache")
+MAX_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = 16
+# Below this many uncached pages a process pool costs more than it saves
+MIN_PARALLEL_PAGES = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _pool
+
+
+def read_bytes(pdf):
+    if isinstance(pdf, (str, os.PathLike)):
+        with open(pdf, "rb") as f:
+            return f.read()
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def source_name(pdf):
+    if isinstance(pdf, (str, os.PathLike)):
+        return os.path.basename(pdf)
+    return getattr(pdf, "name", "document.pdf")
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(PAGE_CACHE_DIR, f"{digest}.jsonl")
+
+
+def iter_cached_pages(digest):
+    path = _cache_path(digest)
+    if not os.path.exists(path):
+        return None
+
+    def pages():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    return pages()
+
+
+class _PageCacheWriter:
+    # Pages are appended one by one so caching never holds a whole file's text
+    def __init__(self, digest):
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        self.digest = digest
+        fd, self.tmp_path = tempfile.mkstemp(dir=PAGE_CACHE_DIR, suffix=".tmp")
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(self, text):
+        self.file.write(json.dumps(text) + "\n")
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.tmp_path, _cache_path(self.digest))
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def _count_pages(path):
+    from PyPDF2 import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_range(path, start, stop):
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+class _PendingFile:
+    def __init__(self, source, digest, data):
+        self.source = source
+        self.digest = digest
+        fd, self.path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.page_count = _count_pages(self.path)
+
+    def ranges(self):
+        for start in range(0, self.page_count, PAGES_PER_TASK):
+            yield self, start, min(start + PAGES_PER_TASK, self.page_count)
+
+    def cleanup(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _iter_parts(tasks, parallel):
+    # Only a small window of ranges is in flight, so parsed text never piles
+    # up ahead of a slow consumer (the embedder) and memory stays flat
+    tasks = iter(tasks)
+    if not parallel:
+        for job, start, stop in tasks:
+            yield job, _extract_range(job.path, start, stop)
+        return
+
+    pool = _get_pool()
+    in_flight = deque()
+    try:
+        for job, start, stop in tasks:
+            in_flight.append((job, pool.submit(_extract_range, job.path, start, stop)))
+            if len(in_flight) >= MAX_WORKERS * 2:
+                job, future = in_flight.popleft()
+                yield job, future.result()
+        while in_flight:
+            job, future = in_flight.popleft()
+            yield job, future.result()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+
+def extract_pages(pdfs, use_cache=True):
+    """Yield (source, page_no, text) for every page of every PDF, in order.
+
+    Pages of files not seen before are parsed in a process pool, each page
+    exactly once, and their text is cached under the file's sha256 so a
+    re-upload skips parsing entirely.
+    """
+    plan = []
+    pending = []
+    writers = {}
+    parts = None
+    try:
+        for pdf in pdfs:
+            data = read_bytes(pdf)
+            digest = file_hash(data)
+            cached = iter_cached_pages(digest) if use_cache else None
+            if cached is not None:
+                plan.append((source_name(pdf), cached))
+            else:
+                job = _PendingFile(source_name(pdf), digest, data)
+                plan.append((job.source, job))
+                pending.append(job)
+            del data
+
+        parallel = MAX_WORKERS > 1 and sum(job.page_count for job in pending) >= MIN_PARALLEL_PAGES
+        parts = _iter_parts((task for job in pending for task in job.ranges()), parallel)
+
+        for source, item in plan:
+            if not isinstance(item, _PendingFile):
+                page_no = 0
+                for page_no, text in enumerate(item, 1):
+                    yield source, page_no, text
+                metrics.count("pdf.pages", page_no, cached="true")
+                continue
+
+            page_no = 0
+            waited = 0.0
+            writer = writers[item] = _PageCacheWriter(item.digest) if use_cache else None
+            while page_no < item.page_count:
+                start = time.perf_counter()
+                _, texts = next(parts)
+                waited += time.perf_counter() - start
+                for text in texts:
+                    page_no += 1
+                    if writer:
+                        writer.write(text)
+                    yield source, page_no, text
+            # Only time spent parsing (or waiting on the pool) is counted, not the consumer's time
+            metrics.record("pdf.extract", waited, source=source, pages=page_no, parallel=parallel)
+            metrics.count("pdf.pages", page_no, cached="false")
+            if writer:
+                writer.commit()
+                del writers[item]
+    finally:
+        if parts is not None:
+            parts.close()
+        for writer in writers.values():
+            if writer:
+                writer.discard()
+        for job in pending:
+            job.cleanup()
@@ -0,0 +1,38 @@
+import threading
+
+
+class ResourceCache:
+    """Keeps expensive per-key objects (vector stores, chains) alive between reruns.
+
+    Each entry remembers the version it was built for; asking for a newer
+    version rebuilds it, and invalidate() drops it outright.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, factory):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+        value = factory()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
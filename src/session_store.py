@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from chat_memory import KEEP_TURNS, ConversationMemory, new_memory_state
+
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL_SECONDS", str(60 * 60)))
+# Cap on the estimated tokens held across all in-memory sessions
+MAX_TOTAL_TOKENS = int(os.getenv("SESSION_MAX_TOTAL_TOKENS", "2000000"))
+SPILL_PATH = os.getenv("SESSION_SPILL_PATH") or None
+
+
+class SessionStore:
+    """Chat memories for many sessions, bounded by count, age and total size.
+
+    Each session is a ConversationMemory, so its own history is already a
+    window of recent turns plus a summary. Sessions past the TTL, or the
+    least recently used ones once max_sessions or max_tokens is exceeded,
+    are evicted. With spill_path set they are written to SQLite and loaded
+    back the next time the session is used; without it they are dropped.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL, max_tokens=MAX_TOTAL_TOKENS,
+                 spill_path=SPILL_PATH, keep_turns=KEEP_TURNS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self._entries = OrderedDict()
+        self._tokens = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if spill_path:
+            self._conn = sqlite3.connect(spill_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _memory(self, state):
+        return ConversationMemory(state, keep_turns=self.keep_turns)
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                state, last_used, tokens = entry
+                # Past the TTL a session is only forgotten when there is no spill file to keep it in
+                if now - last_used <= self.ttl or self._conn is not None:
+                    self._entries[session_id] = (state, now, tokens)
+                    self._entries.move_to_end(session_id)
+                    return self._memory(state)
+                del self._entries[session_id]
+                self._tokens -= tokens
+        state = self._load(session_id)
+        metrics.count("session_store.lookups", outcome="spilled" if state else "new")
+        return self._memory(state or new_memory_state())
+
+    def put(self, session_id, memory):
+        tokens = memory.tokens()
+        with self._lock:
+            old = self._entries.pop(session_id, None)
+            if old is not None:
+                self._tokens -= old[2]
+            self._entries[session_id] = (memory.state, time.time(), tokens)
+            self._tokens += tokens
+            evicted = self._evict()
+        self._spill(evicted)
+
+    def drop(self, session_id):
+        with self._lock:
+            old = self._entries.pop(session_id, None)
+            if old is not None:
+                self._tokens -= old[2]
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._conn.commit()
+
+    def _evict(self):
+        evicted = []
+        now = time.time()
+        while self._entries:
+            session_id, (state, last_used, tokens) = next(iter(self._entries.items()))
+            expired = now - last_used > self.ttl
+            # The newest session stays even if it alone is over the token cap
+            over = len(self._entries) > self.max_sessions or (self._tokens > self.max_tokens and len(self._entries) > 1)
+            if not (expired or over):
+                break
+            self._entries.popitem(last=False)
+            self._tokens -= tokens
+            evicted.append((session_id, state, last_used))
+        if evicted:
+            metrics.count("session_store.evicted", len(evicted))
+        return evicted
+
+    def _spill(self, sessions):
+        if self._conn is None or not sessions:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (id, state, updated) VALUES (?, ?, ?)",
+                [(session_id, json.dumps(state), last_used) for session_id, state, last_used in sessions],
+            )
+            self._conn.commit()
+
+    def _load(self, session_id):
+        if self._conn is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def flush(self):
+        """Write every in-memory session to the spill file, e.g. before shutting down."""
+        with self._lock:
+            sessions = [(session_id, state, last_used) for session_id, (state, last_used, _) in self._entries.items()]
+        self._spill(sessions)
+
+    def prune_spilled(self, max_age):
+        if self._conn is None:
+            return 0
+        with self._lock:
+            count = self._conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age,)).rowcount
+            self._conn.commit()
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._entries), "tokens": self._tokens}
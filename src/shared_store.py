@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import metrics
+from hybrid_retrieval import FETCH_K, HybridRetriever
+from ingest import EMBED_BATCH_SIZE, chunk_id, content_id, iter_batches
+
+SHARED_PERSIST_DIR = os.getenv("SHARED_CHROMA_DIR", "chroma_shared")
+COLLECTION_NAME = "chunks"
+# Unreferenced chunks younger than this may belong to an ingest job that hasn't committed yet
+GC_GRACE_SECONDS = 3600
+UPDATE_BATCH = 1000
+
+
+class SharedChunkStore:
+    """One content-addressed Chroma collection shared by every conversation.
+
+    A chunk is stored and embedded once, under the hash of its text, however
+    many conversations upload it. Which conversations may see a chunk is
+    recorded twice: as (conversation, source, chunk) references in a SQLite
+    table, which is the source of truth, and as a ``conversations`` list in
+    the chunk's metadata, which retrieval filters on.
+
+    Ingestion is two-phase. add() writes any new chunks, invisible to every
+    conversation, and returns the references to create; commit() then applies
+    a whole batch of added and removed references at once, so a conversation
+    sees all of an upload or none of it.
+    """
+
+    def __init__(self, embedding, persist_dir=SHARED_PERSIST_DIR):
+        from langchain_chroma import Chroma
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self.vectorstore = Chroma(
+            collection_name=COLLECTION_NAME,
+            persist_directory=persist_dir,
+            embedding_function=embedding,
+        )
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(persist_dir, "refs.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS refs (
+                conversation_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (conversation_id, source, chunk)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_refs_chunk ON refs (chunk_id)")
+        self._conn.commit()
+
+    @property
+    def collection(self):
+        return self.vectorstore._collection
+
+    def as_retriever(self, conversation_id, keyword_index, k=4, fetch_k=FETCH_K):
+        """Hybrid retrieval over the chunks conversation_id references."""
+        dense = ConversationChunksRetriever(
+            store=self, conversation_id=conversation_id, keyword_index=keyword_index, k=fetch_k
+        )
+        return HybridRetriever(dense=dense, keyword_index=keyword_index, k=k, fetch_k=fetch_k)
+
+    def chunk_refs(self, conversation_id, ids):
+        """Maps content ids to this conversation's own (source, chunk) for them."""
+        ids = list(ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT chunk_id, source, chunk FROM refs WHERE conversation_id = ? AND chunk_id IN ({','.join('?' * len(ids))})",
+                [conversation_id, *ids],
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def add(self, documents, batch_size=EMBED_BATCH_SIZE, progress=None, keyword_index=None):
+        """Store chunks not seen before; returns the (source, chunk, chunk_id) references to commit."""
+        refs = []
+        for batch in iter_batches(documents, batch_size):
+            ids = [content_id(doc.page_content) for doc in batch]
+            existing = set(self.collection.get(ids=list(set(ids)), include=[])["ids"])
+            fresh = {}
+            for doc_id, doc in zip(ids, batch):
+                if doc_id not in existing and doc_id not in fresh:
+                    fresh[doc_id] = Document(page_content=doc.page_content, metadata={**doc.metadata, "added": time.time()})
+            if fresh:
+                with metrics.span("index.write", chunks=len(fresh), chars=sum(len(doc.page_content) for doc in fresh.values())):
+                    self.vectorstore.add_documents(list(fresh.values()), ids=list(fresh))
+            metrics.count("shared_store.chunks_reused", len(batch) - len(fresh))
+
+            if keyword_index is not None:
+                keyword_index.add(batch, [chunk_id(doc) for doc in batch])
+            refs.extend((doc.metadata["source"], doc.metadata["chunk"], doc_id) for doc, doc_id in zip(batch, ids))
+            if progress:
+                progress(len(refs))
+        return refs
+
+    def commit(self, conversation_id, added=(), removed_sources=()):
+        with self._lock, self._conn:
+            affected = set()
+            for source in removed_sources:
+                rows = self._conn.execute(
+                    "SELECT chunk_id FROM refs WHERE conversation_id = ? AND source = ?", (conversation_id, source)
+                ).fetchall()
+                affected.update(row[0] for row in rows)
+                self._conn.execute("DELETE FROM refs WHERE conversation_id = ? AND source = ?", (conversation_id, source))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO refs (conversation_id, source, chunk, chunk_id) VALUES (?, ?, ?, ?)",
+                [(conversation_id, source, chunk, doc_id) for source, chunk, doc_id in added],
+            )
+            affected.update(doc_id for _, _, doc_id in added)
+            visible = self._referenced(affected, conversation_id)
+            unreferenced = affected - self._referenced(affected)
+
+        self._set_membership(conversation_id, affected - unreferenced, visible)
+        self._delete(unreferenced)
+
+    def drop_conversation(self, conversation_id):
+        with self._lock:
+            sources = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT source FROM refs WHERE conversation_id = ?", (conversation_id,)
+            )]
+        self.commit(conversation_id, removed_sources=sources)
+
+    def _referenced(self, ids, conversation_id=None):
+        found = set()
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            query = f"SELECT DISTINCT chunk_id FROM refs WHERE chunk_id IN ({','.join('?' * len(batch))})"
+            params = list(batch)
+            if conversation_id is not None:
+                query += " AND conversation_id = ?"
+                params.append(conversation_id)
+            found.update(row[0] for row in self._conn.execute(query, params))
+        return found
+
+    def _set_membership(self, conversation_id, ids, visible):
+        ids = list(ids)
+        for i in range(0, len(ids), UPDATE_BATCH):
+            batch = ids[i:i + UPDATE_BATCH]
+            current = self.collection.get(ids=batch, include=["metadatas"])
+            update_ids, metadatas = [], []
+            for doc_id, metadata in zip(current["ids"], current["metadatas"]):
+                members = set((metadata or {}).get("conversations") or [])
+                wanted = members | {conversation_id} if doc_id in visible else members - {conversation_id}
+                if wanted != members:
+                    update_ids.append(doc_id)
+                    # Chroma rejects empty lists; None removes the key
+                    metadatas.append({"conversations": sorted(wanted) or None})
+            if update_ids:
+                self.collection.update(ids=update_ids, metadatas=metadatas)
+
+    def _delete(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), UPDATE_BATCH):
+            self.collection.delete(ids=ids[i:i + UPDATE_BATCH])
+        if ids:
+            metrics.count("shared_store.chunks_deleted", len(ids))
+
+    def collect_garbage(self, grace_seconds=GC_GRACE_SECONDS):
+        """Delete chunks no conversation references, e.g. left behind by cancelled jobs."""
+        cutoff = time.time() - grace_seconds
+        stale = []
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=UPDATE_BATCH, offset=offset)
+            if not page["ids"]:
+                break
+            candidates = [
+                doc_id for doc_id, metadata in zip(page["ids"], page["metadatas"])
+                if (metadata or {}).get("added", 0) < cutoff
+            ]
+            with self._lock:
+                stale.extend(set(candidates) - self._referenced(candidates))
+            offset += len(page["ids"])
+        self._delete(stale)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            refs, conversations = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT conversation_id) FROM refs"
+            ).fetchone()
+        return {"chunks": self.collection.count(), "references": refs, "conversations": conversations}
+
+
+class ConversationChunksRetriever(BaseRetriever):
+    """Dense search over one conversation's chunks in the shared store.
+
+    A stored chunk carries the metadata of whoever uploaded it first, so hits
+    are swapped for the conversation's own copy from its keyword index.
+    """
+
+    store: Any
+    conversation_id: str
+    keyword_index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs = self.store.vectorstore.similarity_search(
+            query, k=self.k, filter={"conversations": {"$contains": self.conversation_id}}
+        )
+        refs = self.store.chunk_refs(self.conversation_id, {content_id(doc.page_content) for doc in docs})
+        own = []
+        for doc in docs:
+            ref = refs.get(content_id(doc.page_content))
+            own.append(self.keyword_index.docs.get(f"{ref[0]}:{ref[1]}", doc) if ref else doc)
+        return own
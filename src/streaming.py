@@ -0,0 +1,37 @@
+from langchain_core.prompts import format_document
+
+
+def text_stream(chunks):
+    for chunk in chunks:
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield text
+
+
+def stream_llm(llm, prompt, callbacks=None):
+    config = {"callbacks": callbacks} if callbacks else None
+    return text_stream(llm.stream(prompt, config=config))
+
+
+def stuff_prompt(stuff_chain, docs, question):
+    # Builds exactly what a "stuff" chain (load_qa_chain / RetrievalQA) would send
+    context = stuff_chain.document_separator.join(
+        format_document(doc, stuff_chain.document_prompt) for doc in docs
+    )
+    return stuff_chain.llm_chain.prompt.format_prompt(context=context, question=question)
+
+
+def stream_stuff_answer(stuff_chain, docs, question, callbacks=None):
+    prompt = stuff_prompt(stuff_chain, docs, question)
+    return stream_llm(stuff_chain.llm_chain.llm, prompt, callbacks)
+
+
+def render_sources(docs, container=None, preview_chars=200):
+    import streamlit as st
+
+    container = container or st
+    with container.expander(f"📄 Sources ({len(docs)})", expanded=False):
+        for doc in docs:
+            source = doc.metadata.get("source")
+            snippet = doc.page_content[:preview_chars].replace("\n", " ")
+            st.markdown(f"- **{source}**: {snippet}…" if source else f"- {snippet}…")
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from langchain.prompts import PromptTemplate
+
+import metrics
+from chat_memory import estimate_tokens
+from embedding_cache import text_hash
+
+CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "summary_cache.sqlite3")
+MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "50000"))
+CHUNK_SIZE = int(os.getenv("SUMMARY_CHUNK_SIZE", "4000"))
+# Partial summaries are combined in groups of at most this many tokens
+REDUCE_TOKEN_BUDGET = int(os.getenv("SUMMARY_REDUCE_TOKENS", "3000"))
+MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+# On average one paragraph in this many ends a chunk early, whatever came before it
+BOUNDARY_EVERY = 4
+
+MAP_PROMPT = PromptTemplate(
+    input_variables=["text"],
+    template="Summarize this section of a longer document. Keep names, numbers and decisions:\n\n{text}",
+)
+REDUCE_PROMPT = PromptTemplate(
+    input_variables=["text"],
+    template="Combine these summaries of consecutive sections into one summary. Keep names, numbers and decisions:\n\n{text}",
+)
+FINAL_PROMPT = PromptTemplate(
+    input_variables=["text"],
+    template="Summarize the following text in 3-4 sentences:\n\n{text}",
+)
+
+
+class SummaryCache:
+    """On-disk cache of LLM summaries, keyed by (model, prompt, sha256 of the text)."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return row[0] if row else None
+
+    def put(self, key, summary):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, last_used) VALUES (?, ?, ?)", (key, summary, time.time())
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM summaries WHERE rowid IN (SELECT rowid FROM summaries ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+
+def split_stable(text, chunk_size=CHUNK_SIZE, splitter=None):
+    """Split text into chunks whose boundaries survive edits elsewhere in the text.
+
+    Paragraphs (oversized ones cut further by the splitter) are packed into
+    chunks of up to chunk_size characters. Besides the size limit, a chunk
+    also ends after any paragraph whose hash picks it as a boundary. An
+    edit therefore only moves boundaries up to the next such paragraph, and
+    later chunks, and their cached summaries, stay the same.
+    """
+    if splitter is None:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if paragraph:
+            pieces.extend(splitter.split_text(paragraph) if len(paragraph) > chunk_size else [paragraph])
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) > chunk_size:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= chunk_size // 4 and int(text_hash(piece)[:8], 16) % BOUNDARY_EVERY == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def group_by_budget(texts, token_budget):
+    groups, current, tokens = [], [], 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if current and tokens + cost > token_budget:
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(text)
+        tokens += cost
+    if current:
+        groups.append(current)
+    return groups
+
+
+class MapReduceSummarizer:
+    """Summarizes text of any length: chunks are summarized concurrently (map),
+    then the partial summaries are combined in token-budgeted groups until
+    one group is left for the final prompt (reduce).
+
+    Every LLM call is cached by its exact input, so summarizing an edited
+    text again only pays for the chunks that changed and the reduce steps
+    above them.
+    """
+
+    def __init__(self, llm, cache=None, chunk_size=CHUNK_SIZE, reduce_tokens=REDUCE_TOKEN_BUDGET,
+                 max_concurrency=MAX_CONCURRENCY, final_prompt=FINAL_PROMPT):
+        self.llm = llm
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.reduce_tokens = reduce_tokens
+        self.max_concurrency = max_concurrency
+        self.final_prompt = final_prompt
+        self.model = getattr(llm, "model", None) or type(llm).__name__
+        self.calls = 0
+        self.cached = 0
+        self._slots = None
+        self._loop = None
+
+    def _semaphore(self):
+        # One semaphore per event loop, shared by every summary running on it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots, self._loop = asyncio.Semaphore(self.max_concurrency), loop
+        return self._slots
+
+    async def _run(self, prompt, text):
+        key = text_hash(f"{self.model}\0{prompt.template}\0{text}")
+        if self.cache is not None:
+            summary = self.cache.get(key)
+            if summary is not None:
+                self.cached += 1
+                metrics.count("summarizer.cache_hits")
+                return summary
+        async with self._semaphore():
+            response = await self.llm.ainvoke(prompt.format(text=text))
+        self.calls += 1
+        summary = response.content.strip()
+        if self.cache is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    async def asummarize(self, text):
+        chunks = split_stable(text, self.chunk_size)
+        if len(chunks) <= 1:
+            return await self._run(self.final_prompt, text)
+
+        with metrics.span("summarize.map", chunks=len(chunks)):
+            summaries = await asyncio.gather(*(self._run(MAP_PROMPT, chunk) for chunk in chunks))
+        groups = group_by_budget(summaries, self.reduce_tokens)
+        while len(groups) > 1:
+            with metrics.span("summarize.reduce", groups=len(groups)):
+                summaries = await asyncio.gather(*(self._run(REDUCE_PROMPT, "\n\n".join(group)) for group in groups))
+            regrouped = group_by_budget(summaries, self.reduce_tokens)
+            if len(regrouped) == len(groups):
+                # Summaries that don't get shorter would loop forever; pair them up instead
+                regrouped = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+            groups = regrouped
+        return await self._run(self.final_prompt, "\n\n".join(groups[0]))
+
+    def summarize(self, text):
+        return asyncio.run(self.asummarize(text))
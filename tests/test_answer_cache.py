@@ -0,0 +1,56 @@
+from answer_cache import AnswerCache
+from bench.fakes import FakeEmbeddings
+
+
+def test_repeated_question_hits_the_same_index_version():
+    cache = AnswerCache(FakeEmbeddings(dim=16))
+    cache.store("conv_a", 1, "What is the warranty?", "Two years.")
+
+    hit = cache.lookup("conv_a", 1, "  what is the WARRANTY ")
+
+    assert hit.answer == "Two years." and hit.similarity == 1.0
+
+
+def test_new_index_version_invalidates_answers():
+    cache = AnswerCache(FakeEmbeddings(dim=16))
+    cache.store("conv_a", 1, "What is the warranty?", "Two years.")
+
+    assert cache.lookup("conv_a", 2, "What is the warranty?") is None
+    # Stale entries are dropped, not just skipped
+    assert len(cache) == 0
+    assert cache.lookup("conv_a", 1, "What is the warranty?") is None
+
+
+def test_answers_are_scoped_to_their_index():
+    cache = AnswerCache(FakeEmbeddings(dim=16))
+    cache.store("conv_a", 1, "What is the warranty?", "Two years.")
+    cache.store("conv_b", 1, "What is the warranty?", "Five years.")
+
+    cache.invalidate("conv_a")
+
+    assert cache.lookup("conv_a", 1, "What is the warranty?") is None
+    assert cache.lookup("conv_b", 1, "What is the warranty?").answer == "Five years."
+
+
+def test_similar_questions_match_above_the_threshold():
+    class SameVector(FakeEmbeddings):
+        def embed_query(self, text):
+            return [1.0] * self.dim
+
+    cache = AnswerCache(SameVector(dim=16), threshold=0.95)
+    cache.store("conv_a", 1, "What is the warranty?", "Two years.")
+
+    assert cache.lookup("conv_a", 1, "How long is the warranty?").answer == "Two years."
+    assert AnswerCache(FakeEmbeddings(dim=16)).lookup("conv_a", 1, "anything") is None
+
+
+def test_questions_about_different_sizes_never_share_an_answer():
+    class SameVector(FakeEmbeddings):
+        def embed_query(self, text):
+            return [1.0] * self.dim
+
+    cache = AnswerCache(SameVector(dim=16), threshold=0.95)
+    cache.store("conv_a", 1, "What is the torque for M8 bolts?", "25 Nm.")
+
+    assert cache.lookup("conv_a", 1, "What is the torque for M10 bolts?") is None
+    assert cache.lookup("conv_a", 1, "What torque do M8 bolts need?").answer == "25 Nm."
@@ -0,0 +1,44 @@
+from bench.fakes import FakeChatModel
+from chat_memory import CHARS_PER_TOKEN, FOLD_BATCH, ConversationMemory
+
+
+def test_turns_are_folded_in_batches_down_to_keep_turns():
+    llm = FakeChatModel(answer_tokens=5)
+    memory = ConversationMemory(keep_turns=2, token_budget=10_000)
+
+    for i in range(2 + FOLD_BATCH):
+        memory.add_turn(f"question {i}", f"answer {i}", llm)
+    assert len(memory.turns) == 2 + FOLD_BATCH and llm.calls == 0
+
+    memory.add_turn("question last", "answer last", llm)
+    assert [user for user, _ in memory.turns] == [f"question {1 + FOLD_BATCH}", "question last"]
+    assert memory.summary and llm.calls == 1
+
+
+def test_memory_stays_within_the_token_budget():
+    memory = ConversationMemory(keep_turns=4, token_budget=200, summary_tokens=50)
+
+    for i in range(20):
+        memory.add_turn(f"question {i} " + "words " * 40, f"answer {i} " + "words " * 40, FakeChatModel())
+        assert memory.tokens() <= 200
+
+    assert len(memory.summary) <= 50 * CHARS_PER_TOKEN
+
+
+def test_a_single_oversized_turn_is_trimmed():
+    memory = ConversationMemory(keep_turns=4, token_budget=100)
+
+    memory.add_turn("q" * 2000, "a" * 2000)
+
+    assert len(memory.turns) == 1
+    assert memory.tokens() <= 100
+
+
+def test_without_an_llm_the_summary_keeps_the_latest_text():
+    memory = ConversationMemory(keep_turns=1, token_budget=10_000, summary_tokens=10)
+
+    for i in range(2 + FOLD_BATCH):
+        memory.add_turn(f"question {i}", f"answer {i}")
+
+    assert memory.summary.endswith(f"AI: answer {FOLD_BATCH}")
+    assert len(memory.summary) <= 10 * CHARS_PER_TOKEN
@@ -0,0 +1,27 @@
+import asyncio
+
+from bench.fakes import FakeChatModel
+from chat_server import ChatServer
+from session_store import SessionStore
+
+
+def test_stream_turn_yields_only_the_answer_on_a_folding_turn():
+    llm = FakeChatModel(answer_tokens=5)
+    sessions = SessionStore(keep_turns=1)
+    server = ChatServer(llm, sessions)
+
+    async def chat():
+        replies = []
+        for i in range(4):
+            replies.append([token async for token in server.stream_turn("s", f"question {i}")])
+        return replies
+
+    replies = asyncio.run(chat())
+
+    memory = sessions.get("s")
+    # The fourth turn pushed the window past keep_turns + FOLD_BATCH and was summarized
+    assert memory.summary
+    assert llm.calls == 5
+    assert [len(tokens) for tokens in replies] == [5, 5, 5, 5]
+    assert "".join(replies[-1]) == memory.turns[-1][1]
+    assert memory.summary not in "".join(replies[-1])
@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from bench.fakes import FakeEmbeddings
+from chat_memory import estimate_tokens
+from context_compression import ContextCompressor
+from embedding_cache import CachedEmbeddings
+
+
+def make_docs():
+    return [
+        Document(page_content=" ".join(f"Filler sentence {d}-{i} about nothing in particular." for i in range(20)) +
+                 f" The pump in document {d} is rated for {d * 10} bar.", metadata={"doc": d})
+        for d in range(4)
+    ]
+
+
+def test_compression_makes_no_embedding_calls(tmp_path):
+    fake = FakeEmbeddings(dim=16)
+    embedding = CachedEmbeddings(fake, model="fake", path=str(tmp_path / "embeddings.sqlite3"))
+    docs = make_docs()
+    # As at ingest and retrieval: chunk and query vectors are already cached
+    embedding.embed_documents([doc.page_content for doc in docs])
+    embedding.embed_query("What pressure is the pump rated for?")
+    embedded = fake.texts
+
+    compressed = ContextCompressor(embedding=embedding, token_budget=200).compress_documents(
+        docs, "What pressure is the pump rated for?"
+    )
+
+    assert fake.texts == embedded
+    assert sum(estimate_tokens(doc.page_content) for doc in compressed) <= 200
+    assert any("rated for" in doc.page_content for doc in compressed)
+
+
+def test_uncached_chunks_fall_back_to_token_overlap(tmp_path):
+    fake = FakeEmbeddings(dim=16)
+    embedding = CachedEmbeddings(fake, model="fake", path=str(tmp_path / "embeddings.sqlite3"))
+
+    compressed = ContextCompressor(embedding=embedding, token_budget=100).compress_documents(
+        make_docs(), "pump rated bar"
+    )
+
+    assert fake.texts == 0
+    assert all("rated for" in doc.page_content for doc in compressed)
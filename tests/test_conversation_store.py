@@ -0,0 +1,24 @@
+import pytest
+
+from conversation_store import ConversationStore
+
+
+def test_conversations_are_scoped_to_their_owner(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    mine = store.create("alice", "Work", "conversation_index_a")
+    theirs = store.create("bob", "Work", "conversation_index_b")
+
+    assert store.list_conversations("alice") == [(mine, "Work")]
+    assert store.load(theirs, "alice") is None
+    assert store.load(mine, "alice")["persist_dir"] == "conversation_index_a"
+
+    store.delete(theirs, "alice")
+    assert store.list_conversations("bob") == [(theirs, "Work")]
+    assert sorted(store.persist_dirs()) == ["conversation_index_a", "conversation_index_b"]
+
+
+def test_names_are_unique_per_owner(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    store.create("alice", "Work", "conversation_index_a")
+    with pytest.raises(ValueError):
+        store.create("alice", "Work", "conversation_index_b")
@@ -0,0 +1,70 @@
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.retrievers import BaseRetriever
+
+from bench.fakes import FakeChatModel
+from conversational_rag import CONDENSE_TURNS, FastConversationalRAG, recent_turns
+
+
+class RecordingRetriever(BaseRetriever):
+    queries: List[str] = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.queries.append(query)
+        return [Document(page_content=f"about {query}")]
+
+
+HISTORY = [("What does the manual say about firmware updates?", "Install them monthly.")]
+
+
+def test_skip_mode_answers_self_contained_questions_without_condensing():
+    llm = FakeChatModel(answer_tokens=5)
+    retriever = RecordingRetriever(queries=[])
+    rag = FastConversationalRAG(llm, retriever, mode="skip")
+
+    standalone, _, info = rag.prepare("How do I configure the network interface?", HISTORY)
+
+    assert standalone == "How do I configure the network interface?"
+    assert not info["condensed"] and llm.calls == 0
+    assert retriever.queries == [standalone]
+
+
+def test_follow_ups_are_condensed_once_and_cached():
+    llm = FakeChatModel(answer_tokens=5)
+    retriever = RecordingRetriever(queries=[])
+    rag = FastConversationalRAG(llm, retriever, mode="skip")
+
+    first, _, info = rag.prepare("How often should I do it?", HISTORY)
+    again, _, cached = rag.prepare("How often should I do it?", HISTORY)
+
+    assert info["condensed"] and not info["cache_hit"] and cached["cache_hit"]
+    assert first == again and llm.calls == 1
+    # Retrieval runs on the condensed question only
+    assert retriever.queries == [first, first]
+
+
+def test_condensing_only_sees_the_last_turns():
+    older = [HumanMessage(content=f"question {i}") if i % 2 == 0 else AIMessage(content=f"answer {i}") for i in range(6)]
+    history = [SystemMessage(content="Summary: talked about pumps")] + older
+
+    assert recent_turns(history, turns=2) == older[2:]
+    assert recent_turns([("q1", "a1"), ("q2", "a2")], turns=1) == [("q2", "a2")]
+
+
+def test_condensed_questions_are_reused_when_older_history_changes():
+    llm = FakeChatModel(answer_tokens=5)
+    rag = FastConversationalRAG(llm, RecordingRetriever(queries=[]), mode="always")
+    recent = [(f"Tell me about firmware step {i}", f"Step {i} is done monthly.") for i in range(CONDENSE_TURNS)]
+
+    first, _, _ = rag.prepare("How often?", [SystemMessage(content="Summary: one")] + recent)
+    again, _, info = rag.prepare("How often?", [SystemMessage(content="Summary: two"), ("hi", "hello")] + recent)
+
+    assert info["cache_hit"] and first == again and llm.calls == 1
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        FastConversationalRAG(FakeChatModel(), RecordingRetriever(queries=[]), mode="parallel")
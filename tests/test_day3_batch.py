@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from langchain_core.messages import AIMessage
+
+import day3
+from day3 import run_batch
+
+
+class EchoLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        if "boom" in prompt:
+            raise RuntimeError("model error")
+        return AIMessage(content=f"answer to {prompt.rsplit(': ', 1)[-1]}")
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def test_bad_records_get_error_lines_and_the_rest_still_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "in.jsonl"
+    write_lines(source, ['{"id": "a", "question": "q1"}', '{"id": "b", "question": ', "[1, 2]", '{"question": "boom"}', '{"id": "e"}', '{"id": "f", "question": "q6"}'])
+
+    counts = asyncio.run(run_batch(EchoLLM(), "qna", str(source), str(tmp_path / "out.jsonl"), max_concurrency=2))
+
+    records = {record["id"]: record for record in read_records(tmp_path / "out.jsonl")}
+    assert counts == {"done": 2, "failed": 4, "skipped": 0}
+    assert records["a"]["output"] == "answer to q1" and records["f"]["output"] == "answer to q6"
+    assert records["2"]["error"].startswith("invalid JSON")
+    assert records["3"]["error"] == "not a JSON object"
+    assert records["4"]["error"] == "model error"
+    assert records["e"]["error"] == "missing 'question'"
+
+
+def test_a_rerun_retries_only_unfinished_records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "in.csv"
+    source.write_text("id,question\na,q1\nb,q2\nc,q3\n", encoding="utf-8")
+    output = tmp_path / "out.jsonl"
+    # A's answer made it, b failed, and the run was killed while writing c
+    output.write_text('{"id": "a", "output": "old"}\n{"id": "b", "error": "timeout"}\n{"id": "c", "out', encoding="utf-8")
+
+    llm = EchoLLM()
+    counts = asyncio.run(run_batch(llm, "qna", str(source), str(output), max_concurrency=2))
+
+    assert counts == {"done": 2, "failed": 0, "skipped": 1}
+    assert sorted(prompt.rsplit(": ", 1)[-1] for prompt in llm.prompts) == ["q2", "q3"]
+    # The cut-off line is left alone and new records start on a line of their own
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[2] == '{"id": "c", "out'
+    assert {json.loads(line)["id"] for line in lines[3:]} == {"b", "c"}
+
+
+def test_qna_batches_do_not_open_the_summary_cache(tmp_path, monkeypatch):
+    def no_cache(*args, **kwargs):
+        raise AssertionError("summary cache opened")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(day3, "SummaryCache", no_cache)
+    source = tmp_path / "in.jsonl"
+    write_lines(source, ['{"question": "q1"}'])
+
+    counts = asyncio.run(run_batch(EchoLLM(), "qna", str(source), str(tmp_path / "out.jsonl")))
+
+    assert counts["done"] == 1
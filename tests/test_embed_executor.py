@@ -0,0 +1,53 @@
+import threading
+import time
+
+from bench.fakes import FakeEmbeddings
+from embed_executor import EmbeddingExecutor
+
+
+class ConcurrencyProbe(FakeEmbeddings):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            return super().embed_documents(texts)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_rate_limit_holds_across_separate_calls():
+    executor = EmbeddingExecutor(FakeEmbeddings(dim=8), requests_per_second=5)
+    start = time.monotonic()
+    for i in range(8):
+        executor.embed_query(f"question {i}")
+    # A burst of 5, then one request every 0.2s
+    assert time.monotonic() - start >= 0.5
+    assert executor.requests == 8
+
+
+def test_concurrency_cap_holds_across_threads():
+    probe = ConcurrencyProbe(dim=8, latency=0.05)
+    executor = EmbeddingExecutor(probe, batch_size=1, max_concurrency=2, requests_per_second=0)
+    threads = [threading.Thread(target=executor.embed_documents, args=([f"t{i}-{j}" for j in range(4)],))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert probe.peak <= 2
+    assert executor.texts_embedded == 16
+
+
+def test_embed_documents_keeps_order():
+    fake = FakeEmbeddings(dim=8)
+    executor = EmbeddingExecutor(fake, batch_size=3, requests_per_second=0)
+    texts = [f"text {i}" for i in range(10)]
+    assert executor.embed_documents(texts) == fake.embed_documents(texts)
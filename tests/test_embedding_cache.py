@@ -0,0 +1,39 @@
+import pytest
+
+from bench.fakes import FakeEmbeddings
+from embedding_cache import CachedEmbeddings
+
+
+def make_cache(tmp_path, fake, **kwargs):
+    return CachedEmbeddings(fake, model=kwargs.pop("model", "fake"), path=str(tmp_path / "embeddings.sqlite3"), **kwargs)
+
+
+def test_texts_are_embedded_once_across_instances(tmp_path):
+    fake = FakeEmbeddings(dim=8)
+    first = make_cache(tmp_path, fake).embed_documents(["a", "b", "a"])
+    again = make_cache(tmp_path, fake).embed_documents(["b", "a"])
+
+    assert fake.texts == 2
+    # Stored as float32
+    assert again == [pytest.approx(first[1]), pytest.approx(first[0])]
+
+
+def test_models_and_query_vectors_are_kept_apart(tmp_path):
+    fake = FakeEmbeddings(dim=8)
+    make_cache(tmp_path, fake, model="one").embed_documents(["a"])
+    make_cache(tmp_path, fake, model="two").embed_documents(["a"])
+    make_cache(tmp_path, fake, model="one").embed_query("a")
+
+    assert fake.texts == 3
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    fake = FakeEmbeddings(dim=8)
+    cache = make_cache(tmp_path, fake, max_entries=2)
+    cache.embed_documents(["a"])
+    cache.embed_documents(["b"])
+    cache.embed_documents(["a"])  # touches a, so b is the oldest
+    cache.embed_documents(["c"])
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(["a", "b", "c"])[1] is None
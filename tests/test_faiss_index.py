@@ -0,0 +1,56 @@
+import faiss
+import numpy as np
+
+import faiss_index
+from bench.fakes import FakeEmbeddings
+from faiss_index import build_index, choose_index_type, factory_string, set_search_params, stream_index
+from ingest import ingest_faiss
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype("float32")
+
+
+def test_index_type_follows_collection_size():
+    assert choose_index_type(faiss_index.FLAT_LIMIT - 1) == "flat"
+    assert choose_index_type(faiss_index.FLAT_LIMIT) == "hnsw"
+    assert choose_index_type(faiss_index.HNSW_LIMIT) == "ivf"
+
+
+def test_pq_is_dropped_when_there_is_too_little_to_train_it():
+    assert factory_string("hnsw", 100, pq_m=8) == f"HNSW{faiss_index.HNSW_M}"
+    assert factory_string("ivf", 100000, pq_m=8).endswith(",PQ8")
+
+
+def test_search_params_reach_the_underlying_index():
+    ivf = set_search_params(build_index(vectors(2000), kind="ivf"), nprobe=7, ef_search=0)
+    hnsw = set_search_params(build_index(vectors(200), kind="hnsw"), nprobe=0, ef_search=48)
+
+    assert faiss.extract_index_ivf(ivf).nprobe == 7
+    assert faiss.downcast_index(hnsw).hnsw.efSearch == 48
+
+
+def test_streamed_index_trains_on_a_bounded_sample_and_adds_the_rest():
+    data = vectors(3000)
+    index = stream_index((data[i:i + 250] for i in range(0, 3000, 250)), kind="ivf", train_sample=1000)
+
+    assert index.is_trained
+    assert index.ntotal == 3000
+    # Sized by the sample, not the whole stream
+    assert faiss.extract_index_ivf(index).nlist == 1000 // faiss_index.POINTS_PER_CENTROID
+
+
+def test_untrained_index_types_need_no_sample():
+    index = stream_index((vectors(10, seed=i) for i in range(3)), kind="flat", train_sample=5)
+
+    assert index.ntotal == 30
+    assert stream_index(iter([]), kind="flat") is None
+
+
+def test_ingest_faiss_keeps_texts_in_index_order():
+    texts = [f"chunk {i}" for i in range(40)]
+    store = ingest_faiss(iter(texts), FakeEmbeddings(dim=16), batch_size=7, index_type="flat")
+
+    assert store.index.ntotal == 40
+    assert [store.docstore.search(doc_id).page_content for doc_id in store.index_to_docstore_id.values()] == texts
+    assert store.similarity_search("chunk 12", k=1)[0].page_content == "chunk 12"
@@ -0,0 +1,62 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from hybrid_retrieval import HybridRetriever, KeywordIndex, reciprocal_rank_fusion
+
+
+def doc(text, source="a.pdf"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+class ListRetriever(BaseRetriever):
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.docs
+
+
+def test_rrf_ranks_documents_found_by_both_lists_first():
+    a, b, c, d = doc("a"), doc("b"), doc("c"), doc("d")
+    fused = reciprocal_rank_fusion([[a, b, c], [c, d, a]])
+    # a: ranks 1 and 3, c: ranks 3 and 1, then b (2) ahead of d (2, later list)
+    assert [x.page_content for x in fused][:2] == ["a", "c"]
+    assert {x.page_content for x in fused[2:]} == {"b", "d"}
+
+
+def test_rrf_merges_duplicates_by_content():
+    fused = reciprocal_rank_fusion([[doc("same", "x.pdf")], [doc("same", "y.pdf")]])
+    assert len(fused) == 1
+
+
+def test_keyword_index_remove_source():
+    index = KeywordIndex()
+    index.add([doc("pump pressure", "a.pdf"), doc("pump flow", "b.pdf")], ["1", "2"])
+    index.remove_source("a.pdf")
+    assert [d.metadata["source"] for d, _ in index.search("pump")] == ["b.pdf"]
+    assert "pressure" not in index.postings
+
+
+def test_exact_keyword_hit_beats_documents_ranked_in_both_lists():
+    filler = [doc(f"filler chunk {i} about the pump manual") for i in range(20)]
+    target = doc("PN-000-0002 is the replacement filter")
+    index = KeywordIndex()
+    index.add(filler + [target], [str(i) for i in range(21)])
+    # The dense side never finds the part number; filler ranks well in both lists
+    retriever = HybridRetriever(dense=ListRetriever(docs=filler), keyword_index=index, k=4)
+
+    found = retriever.invoke("What is part number PN-000-0002 in the pump manual?")
+
+    assert found[0].page_content == target.page_content
+
+
+def test_questions_without_exact_terms_keep_rrf_order():
+    docs = [doc(f"pump chunk {word}") for word in ("alpha", "beta", "gamma")]
+    index = KeywordIndex()
+    index.add(docs, ["1", "2", "3"])
+    retriever = HybridRetriever(dense=ListRetriever(docs=docs), keyword_index=index, k=3)
+
+    found = retriever.invoke("pump")
+
+    assert found == reciprocal_rank_fusion([docs, [d for d, _ in index.search("pump", 20)]])[:3]
@@ -0,0 +1,97 @@
+import os
+import time
+
+import pytest
+
+from index_registry import IndexRegistry
+from ingest_jobs import current_index_dir, index_versions, publish_index_dir
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return IndexRegistry(str(tmp_path / "registry.sqlite3"), str(tmp_path / "trash"))
+
+
+def make_dir(path, age=0):
+    os.makedirs(path)
+    with open(os.path.join(path, "chroma.sqlite3"), "w") as f:
+        f.write("x" * 100)
+    stamp = time.time() - age
+    for name in (os.path.join(path, "chroma.sqlite3"), path):
+        os.utime(name, (stamp, stamp))
+    return path
+
+
+def publish(base, version, age=0):
+    path = make_dir(f"{base}.v{version:04d}-job", age)
+    publish_index_dir(base, path, keep=10)
+    stamp = time.time() - age
+    os.utime(f"{base}.current", (stamp, stamp))
+    return path
+
+
+def test_expired_leases_reclaim_every_version_and_the_registration(registry):
+    base = os.path.abspath("chroma_db_abc123")
+    publish(base, 1, age=7200)
+    registry.register(base, "day9", lease=3600)
+    registry._execute("UPDATE indexes SET last_used = 0")
+
+    reclaimed = registry.sweep(grace=60)
+
+    assert {reason for _, _, reason in reclaimed} == {"lease expired"}
+    assert not os.path.exists(f"{base}.current") and index_versions(base) == []
+    assert registry.indexes() == []
+    assert not os.listdir("trash")
+
+
+def test_live_leases_and_recently_written_stores_are_kept(registry):
+    renewed = os.path.abspath("chroma_db_renewed")
+    publish(renewed, 1, age=7200)
+    registry.register(renewed, "day9", lease=3600)
+    busy = os.path.abspath("chroma_db_busy")
+    publish(busy, 1)
+    registry.register(busy, "day9", lease=3600)
+    registry._execute("UPDATE indexes SET last_used = 0 WHERE base = ?", (busy,))
+
+    assert registry.sweep(grace=60) == []
+    assert len(registry.indexes()) == 2
+
+
+def test_superseded_and_abandoned_versions_are_swept(registry):
+    base = os.path.abspath("chroma_db")
+    registry.register(base, "day8")
+    oldest = publish(base, 1, age=7200)
+    kept = publish(base, 2, age=7200)
+    current = publish(base, 3, age=7200)
+    abandoned = make_dir(f"{base}.v0004-job", age=7200)
+    building = make_dir(f"{base}.v0005-job")
+
+    reclaimed = registry.sweep(grace=60)
+
+    assert sorted(path for path, _, _ in reclaimed) == [oldest, abandoned]
+    assert index_versions(base) == [kept, current, building]
+    assert current_index_dir(base) == current
+
+
+def test_only_old_unregistered_directories_matching_the_patterns_are_collected(registry):
+    make_dir("chroma_db_orphan", age=7200)
+    make_dir("chroma_db_orphan.v0001-job", age=7200)
+    make_dir("conversation_index_new")
+    make_dir("unrelated_store", age=7200)
+    registered = make_dir("chroma_db_mine", age=7200)
+    registry.register(registered, "day9")
+
+    dry = registry.sweep(grace=60, dry_run=True)
+    assert os.path.exists("chroma_db_orphan")
+
+    reclaimed = registry.sweep(grace=60)
+
+    assert dry == reclaimed
+    assert sorted(os.path.basename(path) for path, _, reason in reclaimed if reason == "unregistered") == [
+        "chroma_db_orphan", "chroma_db_orphan.v0001-job",
+    ]
+    assert all(size == 100 for _, size, _ in reclaimed)
+    assert sorted(name for name in os.listdir(".") if not name.startswith(("registry", "trash"))) == [
+        "chroma_db_mine", "conversation_index_new", "unrelated_store",
+    ]
@@ -0,0 +1,29 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from hybrid_retrieval import tokenize
+from ingest import iter_chunks
+
+
+def test_page_boundary_inside_a_chunk_keeps_words_apart():
+    records = [
+        ("manual.pdf", 1, "Replace the filter as described in the manual"),
+        ("manual.pdf", 2, "PN-000-0002 is the replacement filter."),
+    ]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0)
+
+    chunks = list(iter_chunks(iter(records), splitter))
+
+    assert len(chunks) == 1
+    assert "manualPN" not in chunks[0].page_content
+    assert "pn-000-0002" in tokenize(chunks[0].page_content)
+
+
+def test_carried_over_text_is_separated_from_the_next_page():
+    pages = [("a.pdf", i, " ".join(f"w{i}x{j}" for j in range(60))) for i in range(6)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=0)
+
+    chunks = list(iter_chunks(iter(pages), splitter))
+    words = [word for chunk in chunks for word in chunk.page_content.split()]
+
+    assert words == [word for _, _, text in pages for word in text.split()]
+    assert [chunk.metadata["chunk"] for chunk in chunks] == list(range(len(chunks)))
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from ingest_jobs import (
+    IngestWorker, JobCancelled, JobQueue, building_index, current_index_dir, index_version, index_versions,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.sqlite3"), spool_dir=str(tmp_path / "spool"))
+
+
+def test_jobs_are_claimed_in_submission_order(queue):
+    first = queue.submit("update", "conv_a")
+    second = queue.submit("update", "conv_a")
+    queue.submit("other", "conv_a")
+
+    assert queue.claim(["update"])["id"] == first
+    assert queue.claim(["update"])["id"] == second
+    assert queue.claim(["update"]) is None
+
+
+def test_cancelling_a_queued_job_keeps_it_from_running(queue):
+    cancelled = queue.submit("update", "conv_a")
+    kept = queue.submit("update", "conv_a")
+
+    queue.cancel(cancelled)
+
+    assert queue.get(cancelled)["status"] == "cancelled"
+    assert queue.claim(["update"])["id"] == kept
+
+
+def test_cancelling_a_running_job_stops_it_at_its_next_check(queue):
+    worker = IngestWorker(queue)
+    seen = []
+
+    def handler(payload, job):
+        seen.append(job.id)
+        queue.cancel(job.id)
+        job.check()
+        return {"docs": []}
+
+    worker.register("update", handler)
+    job_id = queue.submit("update", "conv_a")
+    worker.run(queue.claim(["update"]))
+
+    assert seen == [job_id]
+    assert queue.get(job_id)["status"] == "cancelled"
+
+
+def test_failed_jobs_record_their_error(queue):
+    worker = IngestWorker(queue)
+
+    def handler(payload, job):
+        raise RuntimeError("bad pdf")
+
+    worker.register("update", handler)
+    job_id = queue.submit("update", "conv_a")
+    worker.run(queue.claim(["update"]))
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "bad pdf"
+
+
+def test_orphaned_running_jobs_are_requeued(queue):
+    job_id = queue.submit("update", "conv_a")
+    queue.claim(["update"])
+
+    assert queue.requeue_orphans(["update"], stale_after=60) == 0
+    assert queue.requeue_orphans(["update"], stale_after=-1) == 1
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_index_versions_are_published_only_when_complete(tmp_path):
+    base = str(tmp_path / "conversation_index_x")
+    with building_index(base, "job1") as path:
+        open(os.path.join(path, "marker"), "w").close()
+    assert current_index_dir(base) == path
+
+    with pytest.raises(JobCancelled):
+        with building_index(base, "job2", copy_current=True) as failed:
+            assert os.path.exists(os.path.join(failed, "marker"))
+            raise JobCancelled("job2")
+    assert current_index_dir(base) == path
+    assert not os.path.exists(failed)
+    assert index_versions(base) == [path]
+
+
+class Upload:
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+def test_spooled_uploads_stay_inside_the_job_directory(queue, tmp_path):
+    job_id = queue.submit("update", "conv_a", files=[
+        Upload("../../escape.pdf", b"1"), Upload("report.pdf", b"2"), Upload("report.pdf", b"3"), Upload("..", b"4"),
+    ])
+    paths = queue.get(job_id)["payload"]["files"]
+
+    job_dir = os.path.realpath(os.path.join(queue.spool_dir, job_id))
+    assert all(os.path.realpath(path).startswith(job_dir + os.sep) for path in paths)
+    assert [os.path.basename(path) for path in paths] == ["escape.pdf", "report.pdf", "report.pdf", "document.pdf"]
+    assert [open(path, "rb").read() for path in paths] == [b"1", b"2", b"3", b"4"]
+    assert not (tmp_path / "escape.pdf").exists()
+
+
+def test_index_version_changes_with_every_publish(tmp_path):
+    base = str(tmp_path / "chroma_db")
+    assert index_version(base) is None
+
+    with building_index(base, "job1"):
+        pass
+    first = index_version(base)
+    with building_index(base, "job2"):
+        pass
+
+    assert first is not None and index_version(base) != first
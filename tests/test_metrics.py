@@ -0,0 +1,84 @@
+import json
+import threading
+
+import pytest
+
+import metrics
+from metrics import JsonlSink, PrometheusSink, sinks_from_env
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    def install(new_sink):
+        monkeypatch.setattr(metrics, "SINKS", [new_sink])
+        return new_sink
+    return install
+
+
+def test_spans_record_their_parent_and_land_in_the_trace():
+    with metrics.trace("turn") as trace:
+        with metrics.span("retrieve", k=4) as outer:
+            with metrics.span("embed"):
+                pass
+            outer.set(found=3)
+        metrics.count("answer_cache.hits")
+
+    spans = {span["name"]: span for span in trace.summary()["spans"]}
+    assert spans["embed"]["parent"] == "retrieve"
+    assert spans["retrieve"]["parent"] == "turn"
+    assert spans["retrieve"]["k"] == 4 and spans["retrieve"]["found"] == 3
+    assert trace.summary()["counters"] == {"answer_cache.hits": 1}
+
+
+def test_sinks_are_read_from_the_environment(tmp_path):
+    sinks = sinks_from_env(f"log, jsonl:{tmp_path / 'm.jsonl'}, prometheus:{tmp_path / 'm.prom'}")
+
+    assert [type(s).__name__ for s in sinks] == ["LogSink", "JsonlSink", "PrometheusSink"]
+    with pytest.raises(ValueError):
+        sinks_from_env("statsd")
+
+
+def test_jsonl_sink_writes_one_record_per_span_and_counter(tmp_path, sink):
+    path = tmp_path / "metrics.jsonl"
+    sink(JsonlSink(str(path)))
+
+    with metrics.span("index.write", chunks=2):
+        pass
+    metrics.count("condense.skipped", mode="skip")
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(r["type"], r["name"]) for r in records] == [("span", "index.write"), ("counter", "condense.skipped")]
+    assert records[0]["chunks"] == 2 and records[1]["mode"] == "skip"
+
+
+def test_prometheus_sink_escapes_label_values_and_flushes_the_rest(tmp_path, sink):
+    path = tmp_path / "metrics.prom"
+    prometheus = sink(PrometheusSink(str(path), min_interval=3600))
+
+    metrics.count("uploads", source='C:\\docs\\"spec"\nv2.pdf')
+    metrics.count("uploads", source="other.pdf")
+    # The second count came inside min_interval, so only flush() writes it
+    assert "other.pdf" not in path.read_text()
+    prometheus.flush()
+
+    text = path.read_text()
+    assert 'rag_uploads_total{source="C:\\\\docs\\\\\\"spec\\"\\nv2.pdf"} 1' in text
+    assert 'rag_uploads_total{source="other.pdf"} 1' in text
+
+
+def test_prometheus_sink_counts_from_many_threads(tmp_path):
+    prometheus = PrometheusSink(str(tmp_path / "metrics.prom"), min_interval=0)
+
+    def work():
+        for _ in range(200):
+            prometheus.count("hits", 1, {})
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    prometheus.flush()
+
+    assert "rag_hits_total 800" in (tmp_path / "metrics.prom").read_text()
+    assert not (tmp_path / "metrics.prom.tmp").exists()
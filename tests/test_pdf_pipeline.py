@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+import pdf_pipeline
+from bench.corpus import make_pdf
+from pdf_pipeline import extract_pages
+
+
+def write_pdf(path, pages):
+    path.write_bytes(make_pdf([[f"{path.stem} page {i}"] for i in range(1, pages + 1)]))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def page_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "page_cache"
+    monkeypatch.setattr(pdf_pipeline, "PAGE_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def extracted_ranges(monkeypatch):
+    ranges = []
+    extract_range = pdf_pipeline._extract_range
+
+    def recording(path, start, stop):
+        ranges.append((start, stop))
+        return extract_range(path, start, stop)
+
+    monkeypatch.setattr(pdf_pipeline, "_extract_range", recording)
+    return ranges
+
+
+def test_pages_come_out_in_order_across_files(tmp_path, extracted_ranges):
+    page_count = pdf_pipeline.PAGES_PER_TASK + 3
+    first = write_pdf(tmp_path / "alpha.pdf", page_count)
+    second = write_pdf(tmp_path / "beta.pdf", 2)
+
+    pages = list(extract_pages([first, second]))
+
+    assert [(source, page_no) for source, page_no, _ in pages] == (
+        [("alpha.pdf", i) for i in range(1, page_count + 1)] + [("beta.pdf", 1), ("beta.pdf", 2)]
+    )
+    assert "alpha page 17" in pages[16][2]
+    # Every page is parsed exactly once
+    assert extracted_ranges == [(0, pdf_pipeline.PAGES_PER_TASK), (pdf_pipeline.PAGES_PER_TASK, page_count), (0, 2)]
+
+
+def test_reuploaded_files_are_read_from_the_page_cache(tmp_path, extracted_ranges):
+    path = write_pdf(tmp_path / "manual.pdf", 3)
+    first = list(extract_pages([path]))
+    extracted_ranges.clear()
+
+    with open(path, "rb") as f:
+        again = list(extract_pages([f]))
+
+    assert extracted_ranges == []
+    # The cache is keyed by content, so the open file (no path) still hits
+    assert [text for _, _, text in again] == [text for _, _, text in first]
+
+
+def test_abandoned_extraction_leaves_no_cache_entry(tmp_path, page_cache):
+    path = write_pdf(tmp_path / "manual.pdf", 3)
+
+    pages = extract_pages([path])
+    next(pages)
+    pages.close()
+
+    assert os.listdir(page_cache) == []
+
+
+def test_small_batches_are_parsed_in_process(tmp_path, monkeypatch):
+    seen = []
+    iter_parts = pdf_pipeline._iter_parts
+
+    def recording(tasks, parallel):
+        seen.append(parallel)
+        return iter_parts(tasks, parallel)
+
+    monkeypatch.setattr(pdf_pipeline, "_iter_parts", recording)
+    monkeypatch.setattr(pdf_pipeline, "MAX_WORKERS", 2)
+    path = write_pdf(tmp_path / "manual.pdf", 4)
+
+    list(extract_pages([path], use_cache=False))
+    monkeypatch.setattr(pdf_pipeline, "MIN_PARALLEL_PAGES", 4)
+    list(extract_pages([path], use_cache=False))
+
+    assert seen == [False, True]
+
+
+def test_parallel_extraction_matches_serial(tmp_path, monkeypatch):
+    path = write_pdf(tmp_path / "manual.pdf", pdf_pipeline.PAGES_PER_TASK * 2 + 1)
+    serial = list(extract_pages([path], use_cache=False))
+
+    monkeypatch.setattr(pdf_pipeline, "MAX_WORKERS", 2)
+    monkeypatch.setattr(pdf_pipeline, "MIN_PARALLEL_PAGES", 1)
+    monkeypatch.setattr(pdf_pipeline, "_pool", None)
+    try:
+        parallel = list(extract_pages([path], use_cache=False))
+    finally:
+        pdf_pipeline._get_pool().shutdown()
+
+    assert parallel == serial
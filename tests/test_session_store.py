@@ -0,0 +1,66 @@
+import time
+
+from session_store import SessionStore
+
+
+def remember(store, session_id, text="hello"):
+    memory = store.get(session_id)
+    memory.add_turn(text, f"re: {text}")
+    store.put(session_id, memory)
+    return memory
+
+
+def test_least_recently_used_sessions_go_first():
+    store = SessionStore(max_sessions=2, ttl=3600, spill_path=None)
+    remember(store, "a")
+    remember(store, "b")
+    store.get("a")  # touches a, so b is the oldest
+    remember(store, "c")
+
+    assert store.stats()["sessions"] == 2
+    assert store.get("a").turns and store.get("c").turns
+    assert store.get("b").turns == []
+
+
+def test_expired_sessions_are_forgotten_without_a_spill_file(monkeypatch):
+    store = SessionStore(ttl=60, spill_path=None)
+    remember(store, "a")
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    assert store.get("a").turns == []
+    assert store.stats() == {"sessions": 0, "tokens": 0}
+
+
+def test_the_token_cap_evicts_old_sessions_but_keeps_the_newest():
+    store = SessionStore(max_tokens=100, ttl=3600, spill_path=None)
+    remember(store, "a", "x" * 200)
+    remember(store, "b", "y" * 200)
+
+    assert store.stats()["sessions"] == 1
+    assert store.get("b").turns and store.get("a").turns == []
+
+
+def test_evicted_sessions_are_spilled_and_reloaded(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SessionStore(max_sessions=1, ttl=3600, spill_path=path)
+    remember(store, "a", "first question")
+    remember(store, "b")
+
+    assert store.stats()["sessions"] == 1
+    assert store.get("a").turns == [["first question", "re: first question"]]
+
+
+def test_flushed_sessions_survive_a_restart(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SessionStore(spill_path=path)
+    remember(store, "a")
+    store.flush()
+
+    restarted = SessionStore(spill_path=path)
+    assert restarted.get("a").turns == [["hello", "re: hello"]]
+
+    restarted.drop("a")
+    assert SessionStore(spill_path=path).get("a").turns == []
+    assert restarted.prune_spilled(max_age=0) == 0
@@ -0,0 +1,84 @@
+import pytest
+from langchain_core.documents import Document
+
+from bench.fakes import FakeEmbeddings
+from hybrid_retrieval import KeywordIndex
+from ingest import content_id
+from shared_store import SharedChunkStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANONYMIZED_TELEMETRY", "False")
+    return SharedChunkStore(FakeEmbeddings(dim=16), persist_dir=str(tmp_path / "shared"))
+
+
+def chunks(source, *texts):
+    return [Document(page_content=text, metadata={"source": source, "chunk": i}) for i, text in enumerate(texts)]
+
+
+def members(store, text):
+    found = store.collection.get(ids=[content_id(text)], include=["metadatas"])
+    if not found["ids"]:
+        return None
+    return set((found["metadatas"][0] or {}).get("conversations") or [])
+
+
+def test_shared_chunks_are_stored_once(store):
+    added_a = store.add(chunks("a.pdf", "shared text", "only in a"))
+    store.commit("conv_a", added_a)
+    added_b = store.add(chunks("b.pdf", "shared text"))
+    store.commit("conv_b", added_b)
+
+    assert store.stats() == {"chunks": 2, "references": 3, "conversations": 2}
+    assert members(store, "shared text") == {"conv_a", "conv_b"}
+    assert members(store, "only in a") == {"conv_a"}
+
+
+def test_added_chunks_stay_invisible_until_commit(store):
+    added = store.add(chunks("a.pdf", "pending text"))
+    assert members(store, "pending text") == set()
+
+    store.commit("conv_a", added)
+    assert members(store, "pending text") == {"conv_a"}
+
+
+def test_drop_keeps_chunks_other_conversations_use(store):
+    store.commit("conv_a", store.add(chunks("a.pdf", "shared text", "only in a")))
+    store.commit("conv_b", store.add(chunks("b.pdf", "shared text")))
+
+    store.drop_conversation("conv_a")
+    assert members(store, "shared text") == {"conv_b"}
+    assert members(store, "only in a") is None
+
+    store.drop_conversation("conv_b")
+    assert store.stats()["chunks"] == 0
+
+
+def test_removing_a_source_only_drops_its_references(store):
+    store.commit("conv_a", store.add(chunks("a.pdf", "first")) + store.add(chunks("b.pdf", "second")))
+
+    store.commit("conv_a", removed_sources=["a.pdf"])
+
+    assert members(store, "first") is None
+    assert members(store, "second") == {"conv_a"}
+
+
+def test_garbage_collection_spares_uncommitted_chunks_within_grace(store):
+    store.add(chunks("a.pdf", "never committed"))
+    store.commit("conv_a", store.add(chunks("b.pdf", "committed")))
+
+    assert store.collect_garbage() == 0
+    assert store.collect_garbage(grace_seconds=0) == 1
+    assert members(store, "never committed") is None
+    assert members(store, "committed") == {"conv_a"}
+
+
+def test_retriever_only_sees_the_conversations_chunks(store):
+    index_a, index_b = KeywordIndex(), KeywordIndex()
+    store.commit("conv_a", store.add(chunks("a.pdf", "pump manual for a"), keyword_index=index_a))
+    store.commit("conv_b", store.add(chunks("b.pdf", "pump manual for b"), keyword_index=index_b))
+
+    found = store.as_retriever("conv_a", index_a, k=4).invoke("pump manual")
+
+    assert [doc.page_content for doc in found] == ["pump manual for a"]
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+from bench.startup import parse_importtime
+
+STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:        10 |         10 |     leaf
+import time:        20 |         30 |   child
+import time:        40 |         70 | parent
+import time:         5 |          5 | sibling
+not an importtime line
+"""
+
+
+def test_depth_counts_nesting_below_top_level_imports():
+    assert parse_importtime(STDERR) == [
+        (10, 10, "leaf", 2),
+        (30, 20, "child", 1),
+        (70, 40, "parent", 0),
+        (5, 5, "sibling", 0),
+    ]
+
+
+def test_top_level_cumulative_times_cover_every_import_once():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import json, email.message"],
+        capture_output=True, text=True, check=True,
+    )
+    entries = parse_importtime(proc.stderr)
+    top_level = [entry for entry in entries if entry[3] == 0]
+
+    assert {"json", "email.message"} <= {name for _, _, name, _ in top_level}
+    # Equal up to the rounding of each µs figure; counting nested imports too would overshoot
+    assert sum(cumulative for cumulative, _, _, _ in top_level) == pytest.approx(sum(self_us for _, self_us, _, _ in entries), rel=0.01)
@@ -0,0 +1,56 @@
+from bench.fakes import FakeChatModel
+from summarizer import MapReduceSummarizer, SummaryCache, split_stable
+
+CHUNK_SIZE = 1000
+
+
+def paragraphs(count):
+    return [(f"Paragraph {i} covers pump model P-{i:03d}. " + f"Detail {i} about maintenance and torque. " * 4).strip() for i in range(count)]
+
+
+def test_chunks_keep_all_the_text_and_respect_the_size():
+    parts = paragraphs(60)
+    chunks = split_stable("\n\n".join(parts), CHUNK_SIZE)
+
+    assert "\n\n".join(chunks) == "\n\n".join(parts)
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    assert len(chunks) > 60 * len(parts[0]) // CHUNK_SIZE
+
+
+def test_an_edit_only_moves_nearby_boundaries():
+    parts = paragraphs(60)
+    before = split_stable("\n\n".join(parts), CHUNK_SIZE)
+    parts[5] = "A new opening sentence was inserted here. " + parts[5]
+    after = split_stable("\n\n".join(parts), CHUNK_SIZE)
+
+    changed = [chunk for chunk in after if chunk not in before]
+    assert 1 <= len(changed) <= 2
+    # Everything after the edit's chunk lines up exactly as before
+    assert after[-(len(before) - 3):] == before[-(len(before) - 3):]
+
+
+def test_resummarizing_an_edited_text_reuses_cached_chunks(tmp_path):
+    cache = SummaryCache(str(tmp_path / "summaries.sqlite3"))
+    parts = paragraphs(60)
+    first = MapReduceSummarizer(FakeChatModel(answer_tokens=8), cache=cache, chunk_size=CHUNK_SIZE)
+    first.summarize("\n\n".join(parts))
+
+    parts[40] += " Revised torque: 30 Nm."
+    llm = FakeChatModel(answer_tokens=8)
+    again = MapReduceSummarizer(llm, cache=cache, chunk_size=CHUNK_SIZE)
+    again.summarize("\n\n".join(parts))
+
+    # The changed chunk, the reduce step above it and the final prompt
+    assert again.calls <= 4 < first.calls
+    assert again.cached >= first.calls - 4
+    assert llm.calls == again.calls
+
+
+def test_short_texts_go_straight_to_the_final_prompt(tmp_path):
+    llm = FakeChatModel(answer_tokens=8)
+    summarizer = MapReduceSummarizer(llm, cache=SummaryCache(str(tmp_path / "summaries.sqlite3")))
+
+    summarizer.summarize("Just one short paragraph.")
+    summarizer.summarize("Just one short paragraph.")
+
+    assert llm.calls == 1 and summarizer.cached == 1